@@ -10,7 +10,7 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 import json
 
-from src.rag.workflow import rag_workflow, RAGState
+from src.rag.workflow import get_rag_workflow, RAGState
 from src.prompts.prompt_manager import get_prompt_manager
 from src.knowledge_base.knowledge_base_manager import get_knowledge_base_manager
 from config.settings import get_settings
@@ -72,7 +72,7 @@ async def chat(request: ChatRequest):
         #     get_settings().current_collection_name = request.collection_name
         
         # 直接传递collection_name给workflow
-        workflow_result = await rag_workflow.run(
+        workflow_result = await get_rag_workflow().run(
             query=request.query,
             collection_name=request.collection_name
         )
@@ -224,7 +224,7 @@ async def chat_stream(request: ChatRequest):
             async def run_workflow():
                 nonlocal workflow_complete, workflow_result, workflow_error
                 try:
-                    workflow_result = await rag_workflow.run(
+                    workflow_result = await get_rag_workflow().run(
                         query=request.query,
                         collection_name=request.collection_name,  # 直接传递给workflow
                         stream_callback=sync_callback
@@ -11,9 +11,11 @@ import os
 
 from config.settings import get_settings, get_model_config
 from app.api import knowledge_base, chat  # API模块
+from src.utils.logging_utils import setup_queue_logging
 
-# 配置日志
+# 配置日志（经由队列异步写出，避免阻塞事件循环）
 logging.basicConfig(level=logging.INFO)
+setup_queue_logging()
 logger = logging.getLogger(__name__)
 
 # 获取配置
@@ -80,6 +80,14 @@ class Settings(BaseSettings):
     request_timeout: int = Field(default=30, env="REQUEST_TIMEOUT")
     embedding_batch_size: int = Field(default=100, env="EMBEDDING_BATCH_SIZE")
     reranking_batch_size: int = Field(default=32, env="RERANKING_BATCH_SIZE")
+    # 向量量化：空（FP32）或 int8（SQ8索引）
+    kb_quantize: str = Field(default="", env="KB_QUANTIZE")
+    # 入库时并发执行的批次数上限
+    kb_max_inflight_batches: int = Field(default=4, env="KB_MAX_INFLIGHT_BATCHES")
+    # IVF索引检索的并行模式：0 按查询并行，2 同时跨倒排列表并行（单条查询更快）
+    kb_search_parallel_mode: int = Field(default=2, env="KB_SEARCH_PARALLEL_MODE")
+    # 本地FAISS镜像加速小集合检索：仅在单一写入进程时开启
+    kb_local_mirror: bool = Field(default=False, env="KB_LOCAL_MIRROR")
     
     # 存储配置
     knowledge_base_path: str = Field(default="./knowledge_base", env="KNOWLEDGE_BASE_PATH")
@@ -241,6 +249,21 @@ class ModelConfig:
             }
             
             model = DashScopeEmbeddings(**embedding_params)
+        elif provider == "http":
+            # 本地嵌入服务（Infinity / TEI），OpenAI兼容的 /embeddings 接口
+            from src.embeddings.http_embeddings import HTTPEmbeddings
+            
+            embedding_params = {
+                key: self._resolve_env_vars(value)
+                for key, value in model_config["parameters"].items()
+            }
+            embedding_params["base_url"] = self._resolve_env_vars(model_config["base_url"])
+            if "api_key_env" in model_config:
+                embedding_params["api_key"] = os.getenv(model_config["api_key_env"])
+            if "batch_size" in model_config:
+                embedding_params["batch_size"] = model_config["batch_size"]
+            
+            model = HTTPEmbeddings(**embedding_params)
         else:
             raise ValueError(f"不支持的嵌入模型provider: {provider}")
         
@@ -286,6 +309,23 @@ class ModelConfig:
                 "drop_old": store_config.get("drop_old", False)
             }
             
+            # int8量化：新建集合时使用SQ8索引（仅在集合创建时生效）
+            settings = get_settings()
+            if settings.kb_quantize.lower() == "int8":
+                milvus_params["index_params"] = {
+                    "index_type": "IVF_SQ8",
+                    "metric_type": "L2",
+                    "params": {"nlist": 128}
+                }
+                # IVF索引单条查询：跨倒排列表并行扫描（parallel_mode=2）降低延迟
+                search_params = {"nprobe": 16}
+                if settings.kb_search_parallel_mode:
+                    search_params["parallel_mode"] = settings.kb_search_parallel_mode
+                milvus_params["search_params"] = {
+                    "metric_type": "L2",
+                    "params": search_params
+                }
+            
             store = Milvus(**milvus_params)
         else:
             raise ValueError(f"不支持的向量存储provider: {store_config['provider']}")
@@ -27,7 +27,7 @@ logging.getLogger('google').setLevel(logging.ERROR)
 # Add project root directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.rag.workflow import rag_workflow
+from src.rag.workflow import get_rag_workflow
 from src.knowledge_base.knowledge_base_manager import get_knowledge_base_manager
 from src.prompts.prompt_manager import get_prompt_manager
 from config.settings import get_settings
@@ -380,7 +380,7 @@ class TerminalChat:
             print()
             
             # Execute RAG workflow - use streaming output with current collection name
-            result = await rag_workflow.run(
+            result = await get_rag_workflow().run(
                 query, 
                 collection_name=self.settings.current_collection_name,
                 stream_callback=self.stream_chunk_handler
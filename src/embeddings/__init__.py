@@ -0,0 +1 @@
+# Embeddings模块
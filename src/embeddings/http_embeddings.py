@@ -0,0 +1,112 @@
+"""
+HTTP Embedding Server Client - LangChain adapter for Infinity / TEI style servers
+"""
+
+import asyncio
+import logging
+import weakref
+from typing import List, Optional
+
+import httpx
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPEmbeddings(Embeddings):
+    """Embeddings served by a local OpenAI-compatible /embeddings endpoint"""
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:7997",
+        model: str = "BAAI/bge-m3",
+        api_key: Optional[str] = None,
+        batch_size: int = 32,
+        max_concurrency: int = 8,
+        timeout: float = 60.0,
+    ):
+        """
+        Initialize HTTP embedding client
+
+        Args:
+            base_url: Server root, e.g. http://infinity:7997 or http://tei:8080/v1
+            model: Model name sent with each request
+            api_key: Optional bearer token
+            batch_size: Texts per request; the server fuses concurrent requests itself
+            max_concurrency: Maximum in-flight requests from aembed_documents
+            timeout: Request timeout in seconds
+        """
+        self.url = base_url.rstrip("/") + "/embeddings"
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self._headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+
+        self._client = httpx.Client(timeout=timeout, headers=self._headers)
+        # An async client binds to the loop it first ran on; the embedder is shared across
+        # loops (run_async may start fresh ones), so each loop gets its own client
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _new_async_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(timeout=self.timeout, headers=self._headers)
+
+    def _async_client(self) -> httpx.AsyncClient:
+        """Async client of the running loop, created on first use"""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None or client.is_closed:
+            client = self._async_clients[loop] = self._new_async_client()
+        return client
+
+    def _payload(self, texts: List[str]) -> dict:
+        return {"model": self.model, "input": texts}
+
+    @staticmethod
+    def _parse(body: dict) -> List[List[float]]:
+        """Extract vectors in input order from an OpenAI-style response"""
+        data = sorted(body["data"], key=lambda item: item.get("index", 0))
+        return [item["embedding"] for item in data]
+
+    def _batches(self, texts: List[str]) -> List[List[str]]:
+        return [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents synchronously, one request per batch"""
+        vectors: List[List[float]] = []
+        for batch in self._batches(texts):
+            resp = self._client.post(self.url, json=self._payload(batch))
+            resp.raise_for_status()
+            vectors.extend(self._parse(resp.json()))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query"""
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents with concurrent requests so the server can fuse them"""
+        client = self._async_client()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def post(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                resp = await client.post(self.url, json=self._payload(batch))
+                resp.raise_for_status()
+                return self._parse(resp.json())
+
+        results = await asyncio.gather(*(post(batch) for batch in self._batches(texts)))
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Embed a single query asynchronously"""
+        return (await self.aembed_documents([text]))[0]
+
+    async def aclose(self):
+        """Close the sync client and the running loop's async client"""
+        self._client.close()
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
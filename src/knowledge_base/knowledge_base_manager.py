@@ -4,15 +4,23 @@ Knowledge Base Manager - Unified management of document processing and vector st
 
 import asyncio
 import json
+import os
+import threading
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Union
-from datetime import datetime
 
+import orjson
 from langchain_core.documents import Document
 
 from .document_processor import DocumentProcessor, DocumentValidator
-from .vector_store_manager import VectorStoreManager
+from .vector_store_manager import VectorStoreManager, invalidate_local_mirror
 from config.settings import get_settings
+from src.rag.response_cache import invalidate_collection
+from src.utils.async_utils import run_in_thread_pool
+from src.utils.time_utils import now_iso
+
+# Serializes read-modify-replace of metadata files across manager instances
+_metadata_lock = threading.Lock()
 
 
 class KnowledgeBaseManager:
@@ -46,20 +54,25 @@ class KnowledgeBaseManager:
         """Save processing metadata"""
         metadata_file = self.metadata_path / filename
         
-        # If file exists, load existing data
-        if metadata_file.exists():
-            with open(metadata_file, 'r', encoding='utf-8') as f:
-                existing_data = json.load(f)
-        else:
-            existing_data = {"processing_history": []}
-        
-        # Add new processing record
-        existing_data["processing_history"].append(metadata)
-        existing_data["last_updated"] = datetime.now().isoformat()
-        
-        # Save updated data
-        with open(metadata_file, 'w', encoding='utf-8') as f:
-            json.dump(existing_data, f, ensure_ascii=False, indent=2)
+        with _metadata_lock:
+            # If file exists, load existing data
+            if metadata_file.exists():
+                with open(metadata_file, 'rb') as f:
+                    existing_data = orjson.loads(f.read())
+            else:
+                existing_data = {"processing_history": []}
+            
+            # Add new processing record
+            existing_data["processing_history"].append(metadata)
+            existing_data["last_updated"] = now_iso()
+            
+            # Write to a tempfile and atomically replace, so a crash never truncates the log
+            tmp_file = metadata_file.with_suffix(metadata_file.suffix + ".tmp")
+            with open(tmp_file, 'wb') as f:
+                f.write(orjson.dumps(existing_data, option=orjson.OPT_INDENT_2, default=str))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, metadata_file)
     
     def load_processing_metadata(self, filename: str = "processing_log.json") -> Dict[str, Any]:
         """Load processing metadata"""
@@ -73,8 +86,11 @@ class KnowledgeBaseManager:
     
     async def add_file(self, file_path: Union[str, Path], chunking_strategy: str = None, strategy_params: Dict[str, Any] = None) -> Dict[str, Any]:
         """Add a single file to knowledge base (supports temporary chunking strategy specification)"""
+        # Normalize once at the entry point
+        file_path = Path(file_path)
+        path_str = str(file_path)
         try:
-            print(f"📄 Processing file: {file_path}")
+            print(f"📄 Processing file: {path_str}")
             
             # 1. Process document (supports temporary strategy)
             documents = self.doc_processor.process_file(
@@ -84,24 +100,25 @@ class KnowledgeBaseManager:
             )
             
             # 2. Validate documents
-            valid_documents = DocumentValidator.validate_documents(documents)
+            valid_documents = await run_in_thread_pool(DocumentValidator.validate_documents, documents)
             
             if not valid_documents:
                 return {
                     "success": False,
                     "message": "No valid document content",
-                    "file_path": str(file_path)
+                    "file_path": path_str
                 }
             
             # 3. Vectorize and store
             result = await self.vector_manager.add_documents(valid_documents)
+            invalidate_collection(self.current_collection)
             
             # 4. Save metadata (including strategy information)
             strategy_info = self.doc_processor.get_strategy_info()
             metadata = {
                 "operation": "add_file",
-                "file_path": str(file_path),
-                "timestamp": datetime.now().isoformat(),
+                "file_path": path_str,
+                "timestamp": now_iso(),
                 "total_chunks": len(documents),
                 "valid_chunks": len(valid_documents),
                 "chunking_strategy": strategy_info.get("name", "unknown"),
@@ -109,10 +126,10 @@ class KnowledgeBaseManager:
                 "vector_result": result
             }
             
-            self.save_processing_metadata(metadata)
+            await run_in_thread_pool(self.save_processing_metadata, metadata)
             
             result.update({
-                "file_path": str(file_path),
+                "file_path": path_str,
                 "total_chunks": len(documents),
                 "valid_chunks": len(valid_documents)
             })
@@ -124,21 +141,21 @@ class KnowledgeBaseManager:
                 "success": False,
                 "error": str(e),
                 "message": f"Failed to process file: {str(e)}",
-                "file_path": str(file_path)
+                "file_path": path_str
             }
             
             # Save error metadata
             strategy_info = self.doc_processor.get_strategy_info()
             error_metadata = {
                 "operation": "add_file",
-                "file_path": str(file_path),
-                "timestamp": datetime.now().isoformat(),
+                "file_path": path_str,
+                "timestamp": now_iso(),
                 "chunking_strategy": strategy_info.get("name", "unknown"),
                 "error": str(e),
                 "success": False
             }
             
-            self.save_processing_metadata(error_metadata)
+            await run_in_thread_pool(self.save_processing_metadata, error_metadata)
             
             return error_result
     
@@ -148,8 +165,11 @@ class KnowledgeBaseManager:
                           chunking_strategy: str = None,
                           strategy_params: Dict[str, Any] = None) -> Dict[str, Any]:
         """Add all files in directory to knowledge base (supports automatic strategy selection and format-specific processing)"""
+        # Normalize once at the entry point
+        directory_path = Path(directory_path)
+        path_str = str(directory_path)
         try:
-            print(f"📁 Processing directory: {directory_path}")
+            print(f"📁 Processing directory: {path_str}")
             
             # 1. Process all documents in directory (supports multiple strategies)
             documents = self.doc_processor.process_directory(
@@ -161,13 +181,13 @@ class KnowledgeBaseManager:
             )
             
             # 2. Validate documents
-            valid_documents = DocumentValidator.validate_documents(documents)
+            valid_documents = await run_in_thread_pool(DocumentValidator.validate_documents, documents)
             
             if not valid_documents:
                 return {
                     "success": False,
                     "message": "No valid document content in directory",
-                    "directory_path": str(directory_path)
+                    "directory_path": path_str
                 }
             
             # 3. Extract document summary
@@ -175,25 +195,26 @@ class KnowledgeBaseManager:
             
             # 4. Vectorize and store
             result = await self.vector_manager.add_documents(valid_documents)
+            invalidate_collection(self.current_collection)
             
             # 5. Save metadata (including strategy information)
             strategy_info = self.doc_processor.get_strategy_info()
             metadata = {
                 "operation": "add_directory",
-                "directory_path": str(directory_path),
+                "directory_path": path_str,
                 "recursive": recursive,
                 "auto_strategy": auto_strategy,
                 "chunking_strategy": strategy_info.get("name", "unknown"),
                 "strategy_params": strategy_info.get("parameters", {}),
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": now_iso(),
                 "document_summary": doc_summary,
                 "vector_result": result
             }
             
-            self.save_processing_metadata(metadata)
+            await run_in_thread_pool(self.save_processing_metadata, metadata)
             
             result.update({
-                "directory_path": str(directory_path),
+                "directory_path": path_str,
                 "document_summary": doc_summary
             })
             
@@ -204,21 +225,21 @@ class KnowledgeBaseManager:
                 "success": False,
                 "error": str(e),
                 "message": f"Failed to process directory: {str(e)}",
-                "directory_path": str(directory_path)
+                "directory_path": path_str
             }
             
             # Save error metadata
             strategy_info = self.doc_processor.get_strategy_info()
             error_metadata = {
                 "operation": "add_directory",
-                "directory_path": str(directory_path),
-                "timestamp": datetime.now().isoformat(),
+                "directory_path": path_str,
+                "timestamp": now_iso(),
                 "chunking_strategy": strategy_info.get("name", "unknown"),
                 "error": str(e),
                 "success": False
             }
             
-            self.save_processing_metadata(error_metadata)
+            await run_in_thread_pool(self.save_processing_metadata, error_metadata)
             
             return error_result
     
@@ -262,6 +283,11 @@ class KnowledgeBaseManager:
                 "query": query
             }
     
+    async def search_documents(self, query: str, k: int = 5,
+                               query_vector: Optional[List[float]] = None) -> List[Document]:
+        """Search knowledge base, returning the vector store's documents as-is"""
+        return await self.vector_manager.search_similar(query, k, query_vector=query_vector)
+    
     def get_knowledge_base_stats(self) -> Dict[str, Any]:
         """Get knowledge base statistics"""
         try:
@@ -420,6 +446,8 @@ class KnowledgeBaseManager:
                 # Check and delete collection
                 if utility.has_collection(collection_name, using="temp_connection"):
                     utility.drop_collection(collection_name, using="temp_connection")
+                    invalidate_local_mirror(collection_name)
+                    invalidate_collection(collection_name)
                     print(f"✅ Milvus collection '{collection_name}' deleted")
                 
                 connections.disconnect("temp_connection")
@@ -477,8 +505,11 @@ class KnowledgeBaseManager:
     
     async def update_file(self, file_path: Union[str, Path], chunking_strategy: str = None, strategy_params: Dict[str, Any] = None) -> Dict[str, Any]:
         """Update file in knowledge base (supports temporary chunking strategy specification)"""
+        # Normalize once at the entry point
+        file_path = Path(file_path)
+        path_str = str(file_path)
         try:
-            print(f"🔄 Updating file: {file_path}")
+            print(f"🔄 Updating file: {path_str}")
             
             # 1. Process document (supports temporary strategy)
             documents = self.doc_processor.process_file(
@@ -488,24 +519,25 @@ class KnowledgeBaseManager:
             )
             
             # 2. Validate documents
-            valid_documents = DocumentValidator.validate_documents(documents)
+            valid_documents = await run_in_thread_pool(DocumentValidator.validate_documents, documents)
             
             if not valid_documents:
                 return {
                     "success": False,
                     "message": "No valid document content",
-                    "file_path": str(file_path)
+                    "file_path": path_str
                 }
             
             # 3. Update vector store
             result = await self.vector_manager.update_documents(valid_documents)
+            invalidate_collection(self.current_collection)
             
             # 4. Save metadata (including strategy information)
             strategy_info = self.doc_processor.get_strategy_info()
             metadata = {
                 "operation": "update_file",
-                "file_path": str(file_path),
-                "timestamp": datetime.now().isoformat(),
+                "file_path": path_str,
+                "timestamp": now_iso(),
                 "total_chunks": len(documents),
                 "valid_chunks": len(valid_documents),
                 "chunking_strategy": strategy_info.get("name", "unknown"),
@@ -513,10 +545,10 @@ class KnowledgeBaseManager:
                 "vector_result": result
             }
             
-            self.save_processing_metadata(metadata)
+            await run_in_thread_pool(self.save_processing_metadata, metadata)
             
             result.update({
-                "file_path": str(file_path),
+                "file_path": path_str,
                 "total_chunks": len(documents),
                 "valid_chunks": len(valid_documents)
             })
@@ -528,7 +560,7 @@ class KnowledgeBaseManager:
                 "success": False,
                 "error": str(e),
                 "message": f"Failed to update file: {str(e)}",
-                "file_path": str(file_path)
+                "file_path": path_str
             }
 
 
@@ -539,17 +571,18 @@ class KnowledgeBaseManager:
             
             # Delete documents from vector store
             result = await self.vector_manager.delete_by_metadata({"source": str(source_path)})
+            invalidate_collection(self.current_collection)
             
             if result.get("success"):
                 # Save deletion metadata
                 deletion_metadata = {
                     "operation": "delete_documents_by_source",
                     "source_path": str(source_path),
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": now_iso(),
                     "vector_result": result
                 }
                 
-                self.save_processing_metadata(deletion_metadata)
+                await run_in_thread_pool(self.save_processing_metadata, deletion_metadata)
                 
                 return {
                     "success": True,
@@ -577,12 +610,12 @@ class KnowledgeBaseManager:
             error_metadata = {
                 "operation": "delete_documents_by_source",
                 "source_path": str(source_path),
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": now_iso(),
                 "error": str(e),
                 "success": False
             }
             
-            self.save_processing_metadata(error_metadata)
+            await run_in_thread_pool(self.save_processing_metadata, error_metadata)
             
             return error_result
     
@@ -603,17 +636,18 @@ class KnowledgeBaseManager:
             
             # For exact filename match, we can search by metadata
             result = await self.vector_manager.delete_by_metadata({"filename": filename})
+            invalidate_collection(self.current_collection)
             
             if result.get("success"):
                 # Save deletion metadata
                 deletion_metadata = {
                     "operation": "delete_documents_by_filename",
                     "filename": filename,
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": now_iso(),
                     "vector_result": result
                 }
                 
-                self.save_processing_metadata(deletion_metadata)
+                await run_in_thread_pool(self.save_processing_metadata, deletion_metadata)
                 
                 return {
                     "success": True,
@@ -641,12 +675,12 @@ class KnowledgeBaseManager:
             error_metadata = {
                 "operation": "delete_documents_by_filename",
                 "filename": filename,
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": now_iso(),
                 "error": str(e),
                 "success": False
             }
             
-            self.save_processing_metadata(error_metadata)
+            await run_in_thread_pool(self.save_processing_metadata, error_metadata)
             
             return error_result
     
@@ -654,7 +688,7 @@ class KnowledgeBaseManager:
         """List documents in the knowledge base"""
         try:
             # Get a sample of documents to show available sources
-            docs = await self.vector_manager.search_similar("", k=limit)
+            docs = await self.vector_manager.sample_documents(limit)
             
             # Extract unique sources and filenames
             sources = set()
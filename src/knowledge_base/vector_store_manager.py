@@ -4,21 +4,237 @@ Vector Store Manager - Manages document vectorization and storage
 """
 
 import asyncio
+import hashlib
+import json
+import logging
 import os
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
 from langchain_core.documents import Document
-from config.settings import model_config
-from src.utils.async_utils import run_in_isolated_loop_async, run_in_thread_pool
+from langchain_core.embeddings import Embeddings
+from tqdm import tqdm
+from config.settings import model_config, get_settings
+from src.utils.async_utils import run_in_executor
+from src.utils.time_utils import now_iso
+
+try:
+    import faiss
+    import numpy as np
+except ImportError:  # Local exact-search fast path is optional
+    faiss = None
+    np = None
+
+logger = logging.getLogger(__name__)
+
+
+# Collections smaller than this are searched on the local FAISS mirror
+LOCAL_INDEX_MAX_ENTITIES = 50_000
+
+# Upper bound (seconds) of the random delay before a batch competes for a slot
+BATCH_START_JITTER = 0.05
+
+# Seconds a get_collection_stats result is reused for
+STATS_CACHE_TTL_S = 10.0
+
+# Query embeddings kept across managers (they are created per request)
+QUERY_VECTOR_CACHE_SIZE = 1024
+
+# Search-width candidates tried by tune_search_params, cheapest first
+NPROBE_CANDIDATES = (8, 16, 32, 64, 128)
+EF_CANDIDATES = (16, 32, 64, 128, 256)
+
+# Content hashes per `content_hash in [...]` lookup, keeping expressions well below Milvus' size limit
+DEDUPE_QUERY_CHUNK = 1000
+
+# Ingestion batch size is tuned per collection and embedding model towards this latency
+DEFAULT_BATCH_SIZE = 256
+MAX_BATCH_SIZE = 4096
+TARGET_BATCH_LATENCY_S = 2.0
+BATCH_TUNING_FILE = "batch_tuning.json"
+
+_tuned_batch_sizes: Optional[Dict[str, int]] = None
+_tuning_lock = threading.Lock()
+
+# Vector-store I/O runs on its own pool so it never queues behind the default executor
+_io_executor: Optional[ThreadPoolExecutor] = None
+_io_executor_lock = threading.Lock()
+
+
+_query_vectors: "OrderedDict[tuple, List[float]]" = OrderedDict()
+_query_vectors_lock = threading.Lock()
+
+
+class _LocalMirror:
+    """Local exact-search mirror of one collection (flat FAISS index + parallel Document list)"""
+    
+    def __init__(self, enabled: Optional[bool]):
+        self.index = None
+        self.docs: List[Document] = []
+        # None until the first add decides; only authoritative when it has seen every row
+        self.enabled = enabled
+        self.lock = threading.Lock()
+
+
+# One mirror per collection, shared by every manager of the process (they are created per request)
+_local_mirrors: Dict[str, _LocalMirror] = {}
+_local_mirrors_lock = threading.Lock()
+
+
+def _get_local_mirror(collection_name: Optional[str], supported: bool) -> _LocalMirror:
+    """Process-wide mirror of a collection, created on first use"""
+    key = collection_name or ""
+    mirror = _local_mirrors.get(key)
+    if mirror is None:
+        with _local_mirrors_lock:
+            mirror = _local_mirrors.get(key)
+            if mirror is None:
+                mirror = _local_mirrors[key] = _LocalMirror(None if supported else False)
+    return mirror
+
+
+def invalidate_local_mirror(collection_name: Optional[str]) -> None:
+    """Forget the mirror of a collection written or dropped outside VectorStoreManager"""
+    with _local_mirrors_lock:
+        _local_mirrors.pop(collection_name or "", None)
+
+
+def content_hash(text: str, source: str = "") -> str:
+    """128-bit BLAKE2b digest of a chunk's source and text, stored as the content_hash metadata field"""
+    return hashlib.blake2b(f"{source}\0{text}".encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _get_query_vector(key: tuple) -> Optional[List[float]]:
+    """LRU lookup of a cached query embedding"""
+    with _query_vectors_lock:
+        vector = _query_vectors.get(key)
+        if vector is not None:
+            _query_vectors.move_to_end(key)
+        return vector
+
+
+def _put_query_vector(key: tuple, vector: List[float]) -> None:
+    """Cache a query embedding, evicting the least recently used"""
+    with _query_vectors_lock:
+        _query_vectors[key] = vector
+        _query_vectors.move_to_end(key)
+        if len(_query_vectors) > QUERY_VECTOR_CACHE_SIZE:
+            _query_vectors.popitem(last=False)
+
+
+def _get_io_executor() -> ThreadPoolExecutor:
+    """Shared executor for vector-store calls, created on first use"""
+    global _io_executor
+    if _io_executor is None:
+        with _io_executor_lock:
+            if _io_executor is None:
+                _io_executor = ThreadPoolExecutor(
+                    max_workers=min(32, (os.cpu_count() or 1) * 4),
+                    thread_name_prefix="vs-io"
+                )
+    return _io_executor
+
+
+def _tuning_path() -> Path:
+    return Path(get_settings().knowledge_base_path) / BATCH_TUNING_FILE
+
+
+def _load_tuned_batch_size(key: str) -> Optional[int]:
+    """Last good batch size persisted for key, read from disk once per process"""
+    global _tuned_batch_sizes
+    with _tuning_lock:
+        if _tuned_batch_sizes is None:
+            try:
+                with open(_tuning_path(), 'r', encoding='utf-8') as f:
+                    _tuned_batch_sizes = json.load(f)
+            except (OSError, ValueError):
+                _tuned_batch_sizes = {}
+        return _tuned_batch_sizes.get(key)
+
+
+def _save_tuned_batch_size(key: str, batch_size: int) -> None:
+    """Persist the tuned batch size for key"""
+    global _tuned_batch_sizes
+    with _tuning_lock:
+        sizes = dict(_tuned_batch_sizes or {})
+        sizes[key] = batch_size
+        path = _tuning_path()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(path.suffix + ".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(sizes, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Failed to persist tuned batch size: %s", e)
+            return
+        _tuned_batch_sizes = sizes
 
 
 class VectorStoreManager:
     """Vector Store Manager - Supports dynamic collections"""
     
-    def __init__(self, batch_size: int = 10, collection_name: str = None):
+    def __init__(self, batch_size: Optional[int] = None, collection_name: str = None):
         self.collection_name = collection_name
         self.vector_store = model_config.get_vector_store(collection_name=collection_name)
-        self.batch_size = batch_size
+        # Managers are created per request, so they share one module-level pool
+        self._io_executor = _get_io_executor()
+        
+        # Backend capabilities, probed once instead of with hasattr on every call.
+        # add_embeddings: accepts vectors embedded in one explicit call;
+        # a*: native async methods, preferred over thread-pool dispatch.
+        vs = self.vector_store
+        self._caps: Dict[str, bool] = {
+            'add_embeddings': hasattr(vs, 'add_embeddings') and hasattr(vs, 'embeddings'),
+            'aadd': hasattr(vs, 'aadd_documents'),
+            'asearch': hasattr(vs, 'asimilarity_search'),
+            'ascore': hasattr(vs, 'asimilarity_search_with_score'),
+            'adel': hasattr(vs, 'adelete'),
+            'delete_by_expr': hasattr(vs, 'delete_by_expr'),
+            # Query vectors can be embedded (and memoized) by us and searched directly
+            'by_vector': hasattr(vs, 'embeddings') and hasattr(vs, 'similarity_search_by_vector'),
+        }
+        # Embedders overriding aembed_documents (e.g. OpenAI) embed without holding a thread
+        embeddings = getattr(vs, 'embeddings', None)
+        self._caps['aembed'] = (
+            embeddings is not None
+            and getattr(type(embeddings), 'aembed_documents', None) not in (None, Embeddings.aembed_documents)
+        )
+        
+        # Without an explicit batch size, start from the last tuned value and keep adapting
+        embeddings = getattr(self.vector_store, 'embeddings', None)
+        model_name = getattr(embeddings, 'model', None) or type(embeddings).__name__
+        self._tuning_key = f"{model_name}:{collection_name or 'default'}"
+        self._embedding_model_name = model_name
+        self._auto_batch_size = batch_size is None
+        self.batch_size = batch_size or _load_tuned_batch_size(self._tuning_key) or DEFAULT_BATCH_SIZE
+        self._target_batch_latency_s = TARGET_BATCH_LATENCY_S
+        
+        # Local exact-search mirror, shared per collection so every manager sees every write.
+        # Opt-in (KB_LOCAL_MIRROR) for single-writer deployments; enabled lazily on the first
+        # add into an empty collection, and only served while the backend row count matches.
+        self._mirror = _get_local_mirror(
+            collection_name,
+            faiss is not None and self._caps['add_embeddings'] and get_settings().kb_local_mirror
+        )
+        # Ranks with the backend's metric so both paths return the same order
+        self._mirror_metric = self._backend_metric()
+        # KB_QUANTIZE=int8 stores mirror vectors as 8-bit scalar codes (4x smaller)
+        self._quantize_int8 = get_settings().kb_quantize.lower() == "int8"
+        # Statistics strategy is resolved once instead of probed on every call
+        self._stats_fn = self._select_stats_fn()
+        # (monotonic timestamp, stats) of the last successful lookup
+        self._stats_cache: Optional[tuple] = None
+        self._stats_ttl = STATS_CACHE_TTL_S
+        # Index search params (e.g. {"nprobe": 32}) used when a search passes none
+        self._search_params: Optional[Dict[str, Any]] = None
+        # Batches embedded/upserted concurrently during ingestion
+        self._max_inflight_batches = max(1, get_settings().kb_max_inflight_batches)
+        self._embed_batch_size = max(1, get_settings().embedding_batch_size)
     
     async def add_documents(self, documents: List[Document], 
                           batch_size: Optional[int] = None) -> Dict[str, Any]:
@@ -27,259 +243,767 @@ class VectorStoreManager:
             return {"success": False, "message": "No documents to add"}
         
         batch_size = batch_size or self.batch_size
+        initial_tuned_size = self.batch_size
         total_docs = len(documents)
-        added_count = 0
-        failed_count = 0
-        results = []
         
-        print(f"🚀 Starting vectorization of {total_docs} document chunks...")
+        logger.info("Starting vectorization of %d document chunks", total_docs)
         
-        # Process in batches
-        for i in range(0, total_docs, batch_size):
-            batch = documents[i:i + batch_size]
-            batch_num = i // batch_size + 1
-            total_batches = (total_docs + batch_size - 1) // batch_size
-            
-            print(f"📦 Processing batch {batch_num}/{total_batches} ({len(batch)} chunks)")
-            
-            try:
-                # Use isolated event loop to avoid conflicts
-                success = await self._add_batch_isolated(batch)
-                
-                if success:
-                    added_count += len(batch)
-                    results.append({
-                        "batch": batch_num,
-                        "success": True,
-                        "count": len(batch),
-                        "message": f"Successfully added {len(batch)} chunks"
-                    })
-                    print(f"✅ Batch {batch_num} completed")
+        # Decide on the local mirror before batches race on an empty collection
+        if self._mirror.enabled is None:
+            self._mirror.enabled = await self._run_io(self._collection_is_empty)
+        
+        # Chunks already stored (or repeated in this call) are not embedded again
+        documents = await self._drop_duplicates(documents)
+        skipped_count = total_docs - len(documents)
+        if skipped_count:
+            logger.info("Skipping %d duplicate chunks already in the store", skipped_count)
+        total_batches = (len(documents) + batch_size - 1) // batch_size
+        # (elapsed seconds, error) of every batch; the batch size is tuned once from these
+        observations: List[tuple] = []
+        
+        if not documents:
+            results = []
+        elif total_batches == 1:
+            # Single batch: nothing to overlap, so skip the queues, workers and semaphore
+            results = [await self._run_single_batch(documents, observations)]
+        else:
+            # Progress bar on interactive terminals only (disable=None); updated from the loop thread
+            with tqdm(total=len(documents), desc="vectorize", unit="chunk", disable=None, leave=False) as progress:
+                if self._caps['add_embeddings']:
+                    # Embed and upsert stages overlap through bounded queues
+                    results = await self._run_pipeline(documents, batch_size, total_batches, progress, observations)
                 else:
-                    failed_count += len(batch)
-                    results.append({
-                        "batch": batch_num,
-                        "success": False,
-                        "count": 0,
-                        "error": "Add failed",
-                        "message": f"Batch {batch_num} failed"
-                    })
-                    print(f"❌ Batch {batch_num} failed")
-                
-            except Exception as e:
-                failed_count += len(batch)
-                error_msg = f"Batch {batch_num} failed: {str(e)}"
-                
-                results.append({
-                    "batch": batch_num,
-                    "success": False,
-                    "count": 0,
-                    "error": str(e),
-                    "message": error_msg
-                })
-                
-                print(f"❌ {error_msg}")
+                    # Backend embeds internally: run whole batches concurrently, bounded by a semaphore
+                    semaphore = asyncio.Semaphore(self._max_inflight_batches)
+                    tasks = [
+                        self._run_batch(
+                            semaphore, documents[i:i + batch_size], i // batch_size + 1, total_batches,
+                            progress, observations
+                        )
+                        for i in range(0, len(documents), batch_size)
+                    ]
+                    results = await asyncio.gather(*tasks)
+        
+        added_count = sum(r["count"] for r in results)
+        failed_count = len(documents) - added_count
+        if added_count:
+            self._stats_cache = None
+        
+        self._tune_batch_size(observations)
+        if self._auto_batch_size and self.batch_size != initial_tuned_size:
+            logger.info("Ingestion batch size tuned from %d to %d", initial_tuned_size, self.batch_size)
+            await self._run_io(_save_tuned_batch_size, self._tuning_key, self.batch_size)
         
-        success_rate = (added_count / total_docs) * 100 if total_docs > 0 else 0
+        success_rate = ((added_count + skipped_count) / total_docs) * 100 if total_docs > 0 else 0
         
         summary = {
             "success": failed_count == 0,
             "total_documents": total_docs,
             "added_count": added_count,
+            "skipped_count": skipped_count,
             "failed_count": failed_count,
             "success_rate": round(success_rate, 2),
             "batch_results": results,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso()
         }
         
-        print(f"\n📊 Vectorization completed:")
-        print(f"  Total chunks: {total_docs}")
-        print(f"  Successfully added: {added_count}")
-        print(f"  Failed count: {failed_count}")
-        print(f"  Success rate: {success_rate:.1f}%")
+        logger.info(
+            "Vectorization completed: total=%d added=%d skipped=%d failed=%d success_rate=%.1f%%",
+            total_docs, added_count, skipped_count, failed_count, success_rate
+        )
         
         return summary
     
-    async def _add_batch_isolated(self, batch: List[Document]) -> bool:
-        """Add batch in isolated thread, prioritize sync methods to avoid event loop conflicts"""
+    async def _drop_duplicates(self, documents: List[Document]) -> List[Document]:
+        """Tag copies of chunks with their content hash and drop those already stored or repeated"""
+        unique: Dict[str, Document] = {}
+        for doc in documents:
+            # Identical text from different files is kept; each file owns its chunks on delete
+            digest = content_hash(doc.page_content, str(doc.metadata.get("source", "")))
+            if digest not in unique:
+                unique[digest] = Document(
+                    id=doc.id, page_content=doc.page_content,
+                    metadata={**doc.metadata, "content_hash": digest}
+                )
+        
+        # Always asked of the backend: the mirror cannot see writes from other processes
+        existing = await self._run_io(self._existing_hashes, list(unique))
+        for digest in existing:
+            unique.pop(digest, None)
+        return list(unique.values())
+    
+    def _existing_hashes(self, hashes: List[str]) -> set:
+        """Content hashes already present in the collection; empty when it cannot be queried"""
+        collection = getattr(self.vector_store, 'col', None)
+        if collection is None or not hashes:
+            return set()
+        existing = set()
+        try:
+            for i in range(0, len(hashes), DEDUPE_QUERY_CHUNK):
+                chunk = hashes[i:i + DEDUPE_QUERY_CHUNK]
+                rows = collection.query(
+                    expr=f"content_hash in {json.dumps(chunk)}",
+                    output_fields=["content_hash"]
+                )
+                existing.update(row.get("content_hash") for row in rows)
+        except Exception as e:
+            # Rows written before hashing existed simply have no content_hash; embed everything
+            logger.warning("Content hash lookup failed, skipping dedupe: %s", e)
+            return set()
+        return existing
+    
+    async def _run_pipeline(self, documents: List[Document], batch_size: int, total_batches: int,
+                            progress: tqdm, observations: List[tuple]) -> List[Dict[str, Any]]:
+        """Embed workers feed upsert workers through bounded queues; returns per-batch results"""
+        workers = self._max_inflight_batches
+        # Embedding requests are sized independently, as a multiple of the upsert batch
+        embed_size = max(1, self._embed_batch_size // batch_size) * batch_size
+        embed_q: asyncio.Queue = asyncio.Queue(maxsize=2 * workers)
+        upsert_q: asyncio.Queue = asyncio.Queue(maxsize=2 * workers)
+        results: List[Optional[Dict[str, Any]]] = [None] * total_batches
+        
+        async def embed_worker():
+            while True:
+                start, chunk = await embed_q.get()
+                try:
+                    texts = [doc.page_content for doc in chunk]
+                    started = time.perf_counter()
+                    try:
+                        vectors = await self._embed_texts(texts)
+                    except Exception as e:
+                        logger.warning("Embedding chunks %d-%d failed: %s", start, start + len(chunk) - 1, e)
+                        observations.append((time.perf_counter() - started, e))
+                        vectors = None
+                    # Each upsert batch is charged its share of the embedding time
+                    per_doc = (time.perf_counter() - started) / len(chunk)
+                    for offset in range(0, len(chunk), batch_size):
+                        end = offset + batch_size
+                        await upsert_q.put((
+                            start + offset,
+                            chunk[offset:end],
+                            texts[offset:end],
+                            vectors[offset:end] if vectors is not None else None,
+                            per_doc * len(chunk[offset:end])
+                        ))
+                finally:
+                    embed_q.task_done()
+        
+        async def upsert_worker():
+            while True:
+                start, batch, texts, vectors, embed_elapsed = await upsert_q.get()
+                batch_num = start // batch_size + 1
+                try:
+                    if vectors is None:
+                        success = await self._add_batch_async(batch)
+                    else:
+                        started = time.perf_counter()
+                        try:
+                            await self._run_io(self._upsert_embedded, batch, texts, vectors)
+                            observations.append((embed_elapsed + time.perf_counter() - started, None))
+                            success = True
+                        except Exception as e:
+                            logger.warning("Upsert of batch %d failed: %s", batch_num, e)
+                            observations.append((embed_elapsed + time.perf_counter() - started, e))
+                            success = await self._add_batch_async(batch)
+                    results[batch_num - 1] = self._batch_result(batch_num, total_batches, batch, success)
+                except Exception as e:
+                    results[batch_num - 1] = self._batch_result(batch_num, total_batches, batch, False, e)
+                finally:
+                    progress.update(len(batch))
+                    upsert_q.task_done()
+        
+        tasks = [asyncio.create_task(embed_worker()) for _ in range(workers)]
+        tasks += [asyncio.create_task(upsert_worker()) for _ in range(workers)]
         try:
-            # Primary strategy: Use sync method directly in thread pool
+            # Bounded puts give backpressure when embedding falls behind
+            for start in range(0, len(documents), embed_size):
+                await embed_q.put((start, documents[start:start + embed_size]))
+            await embed_q.join()
+            await upsert_q.join()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        return results
+    
+    async def _run_single_batch(self, batch: List[Document], observations: List[tuple]) -> Dict[str, Any]:
+        """Add a lone batch inline, without queues or worker tasks"""
+        started = time.perf_counter()
+        if self._caps['add_embeddings']:
+            texts = [doc.page_content for doc in batch]
+            try:
+                vectors = await self._embed_texts(texts)
+            except Exception as e:
+                logger.warning("Embedding single batch failed: %s", e)
+                observations.append((time.perf_counter() - started, e))
+                return self._batch_result(1, 1, batch, await self._add_batch_async(batch))
+            # Only a failed backend write falls back; mirror failures are absorbed in _upsert_embedded
+            try:
+                await self._run_io(self._upsert_embedded, batch, texts, vectors)
+                success = True
+            except Exception as e:
+                logger.warning("Upsert of single batch failed: %s", e)
+                observations.append((time.perf_counter() - started, e))
+                return self._batch_result(1, 1, batch, await self._add_batch_async(batch))
+        else:
+            success = await self._add_batch_isolated(batch)
+        
+        if success:
+            observations.append((time.perf_counter() - started, None))
+        return self._batch_result(1, 1, batch, success)
+    
+    async def _run_batch(self, semaphore: asyncio.Semaphore, batch: List[Document], batch_num: int,
+                         total_batches: int, progress: tqdm, observations: List[tuple]) -> Dict[str, Any]:
+        """Add one batch once a concurrency slot is free and describe the outcome"""
+        # Spread out the first wave so rate-limited providers are not hit at once
+        await asyncio.sleep(random.random() * BATCH_START_JITTER)
+        
+        async with semaphore:
+            started = time.perf_counter()
             try:
-                await run_in_thread_pool(self.vector_store.add_documents, batch)
+                success = await self._add_batch_isolated(batch)
+            except Exception as e:
+                observations.append((time.perf_counter() - started, e))
+                return self._batch_result(batch_num, total_batches, batch, False, e)
+            finally:
+                progress.update(len(batch))
+        
+        if success:
+            observations.append((time.perf_counter() - started, None))
+        return self._batch_result(batch_num, total_batches, batch, success)
+    
+    def _tune_batch_size(self, observations: List[tuple]) -> None:
+        """Step the batch size at most once per call: halve on OOM, else follow the median batch latency"""
+        if not self._auto_batch_size or not observations:
+            return
+        if any(isinstance(error, MemoryError) for _, error in observations):
+            self.batch_size = max(1, self.batch_size // 2)
+            return
+        latencies = sorted(elapsed for elapsed, error in observations if error is None)
+        if not latencies:
+            return
+        median = latencies[len(latencies) // 2]
+        if median < self._target_batch_latency_s / 2:
+            self.batch_size = min(MAX_BATCH_SIZE, self.batch_size * 2)
+        elif median > self._target_batch_latency_s * 2:
+            self.batch_size = max(1, self.batch_size // 2)
+    
+    @staticmethod
+    def _batch_result(batch_num: int, total_batches: int, batch: List[Document],
+                      success: bool, error: Optional[Exception] = None) -> Dict[str, Any]:
+        """Log a batch outcome and build its entry for batch_results"""
+        if error is not None:
+            error_msg = f"Batch {batch_num} failed: {str(error)}"
+            logger.warning("%s", error_msg)
+            return {
+                "batch": batch_num,
+                "success": False,
+                "count": 0,
+                "error": str(error),
+                "message": error_msg
+            }
+        
+        if success:
+            logger.debug("Batch %d/%d completed (%d chunks)", batch_num, total_batches, len(batch))
+            return {
+                "batch": batch_num,
+                "success": True,
+                "count": len(batch),
+                "message": f"Successfully added {len(batch)} chunks"
+            }
+        
+        logger.warning("Batch %d/%d failed", batch_num, total_batches)
+        return {
+            "batch": batch_num,
+            "success": False,
+            "count": 0,
+            "error": "Add failed",
+            "message": f"Batch {batch_num} failed"
+        }
+    
+    async def _add_batch_isolated(self, batch: List[Document]) -> bool:
+        """Add batch, preferring the backend's native async method over the thread pool"""
+        try:
+            if await self._add_batch_async(batch):
                 return True
-            except Exception as sync_e:
-                print(f"⚠️ Sync method execution failed: {sync_e}")
-                
-                # Fallback strategy: Check for async method and try in current loop
-                if hasattr(self.vector_store, 'aadd_documents'):
-                    try:
-                        await self.vector_store.aadd_documents(batch)
-                        return True
-                    except Exception as async_e:
-                        print(f"⚠️ Async method also failed: {async_e}")
-                        return False
-                else:
-                    return False
-            
+            if self._mirror.enabled:
+                with self._mirror.lock:
+                    self._drop_local_index()
+            await self._run_io(self.vector_store.add_documents, batch)
+            return True
         except Exception as e:
-            print(f"❌ Batch add completely failed: {e}")
+            logger.error("Batch add completely failed: %s", e)
+            return False
+    
+    async def _add_batch_async(self, batch: List[Document]) -> bool:
+        """Add through the backend's native async method; False if absent or failed"""
+        if not self._caps['aadd']:
+            return False
+        # These rows bypass the local mirror, which would no longer hold every stored row
+        if self._mirror.enabled:
+            with self._mirror.lock:
+                self._drop_local_index()
+        try:
+            await self.vector_store.aadd_documents(batch)
+            return True
+        except Exception as async_e:
+            logger.warning("Async add method failed: %s", async_e)
             return False
     
     async def search_similar(self, query: str, k: int = 5, 
-                           filter_metadata: Optional[Dict[str, Any]] = None) -> List[Document]:
-        """Search similar documents, prioritize sync methods to avoid event loop conflicts"""
+                           filter_metadata: Optional[Dict[str, Any]] = None,
+                           search_params: Optional[Dict[str, Any]] = None,
+                           query_vector: Optional[List[float]] = None) -> List[Document]:
+        """Search similar documents, preferring native async methods"""
+        # Nothing to match: skip the embedding call and the RPC
+        if k <= 0 or not query or query.isspace():
+            return []
         try:
-            # Primary strategy: Use sync method directly in thread pool
+            # A query_vector from the caller (same embedding model) saves re-embedding
+            if not self._caps['by_vector']:
+                vector = None
+            elif query_vector is not None:
+                vector = query_vector
+            else:
+                vector = await self._query_vector(query)
+            
+            # Fast path: exact search on the local mirror for small collections
+            if vector is not None and not filter_metadata and self._local_index_ready():
+                try:
+                    docs = await self._run_io(self._search_local, vector, k)
+                    if docs is not None:
+                        return docs
+                except Exception as local_e:
+                    logger.warning("Local index search failed, using backend: %s", local_e)
+            
+            param = self._resolve_search_params(search_params)
+            expr = self._build_expr(filter_metadata) if filter_metadata else None
+            
+            # Search by the (memoized) query vector when possible, else let the store embed
+            if vector is not None:
+                target, method = vector, "similarity_search_by_vector"
+            else:
+                target, method = query, "similarity_search"
+            
+            # Primary strategy: native async search in the current loop
+            if self._caps['asearch']:
+                try:
+                    docs = await getattr(self.vector_store, "a" + method)(target, k=k, param=param, expr=expr)
+                    return docs if docs else []
+                except Exception as async_e:
+                    logger.warning("Async search method failed: %s", async_e)
+            
+            # Fallback strategy: sync method in thread pool
             try:
-                if filter_metadata:
-                    docs = await run_in_thread_pool(
-                        self.vector_store.similarity_search, 
-                        query, k, filter_metadata
-                    )
-                else:
-                    docs = await run_in_thread_pool(
-                        self.vector_store.similarity_search, query, k
-                    )
+                docs = await self._run_io(
+                    getattr(self.vector_store, method), target, k, param=param, expr=expr
+                )
                 return docs if docs else []
-                
             except Exception as sync_e:
-                print(f"⚠️ Sync search method failed: {sync_e}")
-                
-                # Fallback strategy: Check for async method and try in current loop
-                if hasattr(self.vector_store, 'asimilarity_search'):
-                    try:
-                        if filter_metadata:
-                            docs = await self.vector_store.asimilarity_search(
-                                query, k=k, filter=filter_metadata
-                            )
-                        else:
-                            docs = await self.vector_store.asimilarity_search(query, k=k)
-                        return docs if docs else []
-                    except Exception as async_e:
-                        print(f"⚠️ Async search method also failed: {async_e}")
-                        return []
-                else:
-                    return []
+                logger.warning("Sync search method failed: %s", sync_e)
+                return []
             
         except Exception as e:
-            print(f"❌ Search completely failed: {str(e)}")
+            logger.error("Search completely failed: %s", e)
             return []
     
-    async def search_with_scores(self, query: str, k: int = 5) -> List[tuple]:
-        """Search similar documents and return similarity scores, prioritize sync methods to avoid event loop conflicts"""
+    async def search_with_scores(self, query: str, k: int = 5,
+                                 search_params: Optional[Dict[str, Any]] = None) -> List[tuple]:
+        """Search similar documents and return similarity scores, preferring native async methods"""
+        if k <= 0 or not query or query.isspace():
+            return []
         try:
-            # Primary strategy: Use sync method directly in thread pool
+            param = self._resolve_search_params(search_params)
+            
+            if self._caps['by_vector']:
+                target, method = await self._query_vector(query), "similarity_search_with_score_by_vector"
+            else:
+                target, method = query, "similarity_search_with_score"
+            
+            # Primary strategy: native async search in the current loop
+            if self._caps['ascore']:
+                try:
+                    docs_with_scores = await getattr(self.vector_store, "a" + method)(target, k=k, param=param)
+                    return docs_with_scores if docs_with_scores else []
+                except Exception as async_e:
+                    logger.warning("Async search with scores method failed: %s", async_e)
+            
+            # Fallback strategy: sync method in thread pool
             try:
-                docs_with_scores = await run_in_thread_pool(
-                    self.vector_store.similarity_search_with_score, query, k
+                docs_with_scores = await self._run_io(
+                    getattr(self.vector_store, method), target, k, param=param
                 )
                 return docs_with_scores if docs_with_scores else []
-                
             except Exception as sync_e:
-                print(f"⚠️ Sync search with scores method failed: {sync_e}")
-                
-                # Fallback strategy: Check for async method and try in current loop
-                if hasattr(self.vector_store, 'asimilarity_search_with_score'):
-                    try:
-                        docs_with_scores = await self.vector_store.asimilarity_search_with_score(query, k=k)
-                        return docs_with_scores if docs_with_scores else []
-                    except Exception as async_e:
-                        print(f"⚠️ Async search with scores method also failed: {async_e}")
-                        return []
-                else:
-                    return []
+                logger.warning("Sync search with scores method failed: %s", sync_e)
+                return []
             
         except Exception as e:
-            print(f"❌ Search with scores completely failed: {str(e)}")
+            logger.error("Search with scores completely failed: %s", e)
             return []
     
-    def get_collection_stats(self) -> Dict[str, Any]:
-        """Get collection statistics"""
+    async def sample_documents(self, limit: int = 50) -> List[Document]:
+        """Return up to `limit` stored chunks via a scalar query, without embedding anything"""
+        if limit <= 0:
+            return []
+        if self._local_index_ready() and await self._run_io(self._local_index_fresh):
+            with self._mirror.lock:
+                return self._mirror.docs[:limit]
+        try:
+            return await self._run_io(self._query_sample, limit)
+        except Exception as e:
+            logger.warning("Sampling documents failed: %s", e)
+            return []
+    
+    def _query_sample(self, limit: int) -> List[Document]:
+        collection = getattr(self.vector_store, 'col', None)
+        if collection is None:
+            return []
+        vs = self.vector_store
+        text_field = getattr(vs, '_text_field', 'text')
+        # Vectors and the primary key are not metadata
+        skip = {getattr(vs, '_primary_field', 'pk'), text_field}
+        vector_field = getattr(vs, '_vector_field', 'vector')
+        skip.update(vector_field if isinstance(vector_field, list) else [vector_field])
+        
+        rows = collection.query(expr="", limit=limit, output_fields=["*"])
+        return [
+            Document(
+                page_content=row.get(text_field, ""),
+                metadata={key: value for key, value in row.items() if key not in skip}
+            )
+            for row in rows
+        ]
+    
+    async def _query_vector(self, query: str) -> List[float]:
+        """Embed a query, reusing the shared LRU of recent query vectors"""
+        key = (self._embedding_model_name, query)
+        vector = _get_query_vector(key)
+        if vector is None:
+            embeddings = self.vector_store.embeddings
+            if self._caps['aembed']:
+                vector = await embeddings.aembed_query(query)
+            else:
+                vector = await self._run_io(embeddings.embed_query, query)
+            _put_query_vector(key, vector)
+        return vector
+    
+    def _resolve_search_params(self, search_params: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Merge short index params ({"nprobe": 32}) into the store's full Milvus search params"""
+        overrides = search_params if search_params is not None else self._search_params
+        if not overrides:
+            return None
+        if "params" in overrides:
+            # Already a complete {"metric_type": ..., "params": {...}} dict
+            return overrides
+        
+        base = getattr(self.vector_store, 'search_params', None)
+        param = dict(base) if isinstance(base, dict) else {}
+        param["params"] = {**param.get("params", {}), **overrides}
+        return param
+    
+    async def tune_search_params(self, sample_queries: List[str], k: int = 10,
+                                 recall_target: float = 0.95) -> Dict[str, Any]:
+        """Pick the cheapest nprobe/ef whose recall@k against a wide search meets recall_target"""
+        index_params = getattr(self.vector_store, 'index_params', None)
+        index_type = index_params.get("index_type", "") if isinstance(index_params, dict) else ""
+        if index_type.startswith("IVF"):
+            key, candidates = "nprobe", NPROBE_CANDIDATES
+            # Probing every list is an exhaustive search
+            reference = {key: index_params.get("params", {}).get("nlist", candidates[-1] * 4)}
+        elif index_type == "HNSW":
+            key, candidates = "ef", tuple(max(ef, k) for ef in EF_CANDIDATES)
+            reference = {key: max(candidates[-1] * 4, k)}
+        else:
+            return {
+                "success": False,
+                "message": f"No tunable search params for index type '{index_type or 'unknown'}'"
+            }
+        
+        if not sample_queries:
+            return {"success": False, "message": "No sample queries provided"}
+        
         try:
-            # Try multiple ways to get statistics
-            stats = {}
+            measurements = await self._run_io(
+                self._measure_search_params, sample_queries, k, key, candidates, reference
+            )
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "message": f"Search param tuning failed: {str(e)}"
+            }
+        
+        chosen = next((m for m in measurements if m["recall"] >= recall_target), measurements[-1])
+        self._search_params = {key: chosen[key]}
+        logger.info(
+            "Search params tuned to %s (recall@%d=%.3f, %.1f QPS)",
+            self._search_params, k, chosen["recall"], chosen["qps"]
+        )
+        
+        return {
+            "success": True,
+            "index_type": index_type,
+            "search_params": self._search_params,
+            "measurements": measurements
+        }
+    
+    def _measure_search_params(self, queries: List[str], k: int, key: str,
+                               candidates: tuple, reference: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Measure recall@k and QPS of each candidate against a reference search"""
+        vectors = self.vector_store.embeddings.embed_documents(queries)
+        
+        def result_ids(vector, params) -> List[Any]:
+            docs = self.vector_store.similarity_search_by_vector(
+                vector, k=k, param=self._resolve_search_params(params)
+            )
+            return [doc.id or doc.page_content for doc in docs]
+        
+        expected = [set(result_ids(vector, reference)) for vector in vectors]
+        
+        measurements = []
+        for value in candidates:
+            started = time.perf_counter()
+            found = [result_ids(vector, {key: value}) for vector in vectors]
+            elapsed = time.perf_counter() - started
             
-            # Method 1: Check if there's a Milvus collection object
-            if hasattr(self.vector_store, 'col') and self.vector_store.col:
-                try:
-                    collection = self.vector_store.col
-                    stats = {
-                        "collection_name": collection.name,
-                        "total_entities": collection.num_entities,
-                        "description": getattr(collection, 'description', 'N/A'),
-                    }
-                    return stats
-                except Exception as e:
-                    print(f"⚠️ Milvus collection stats retrieval failed: {e}")
+            recalls = [
+                len(expected_ids.intersection(ids)) / len(expected_ids)
+                for expected_ids, ids in zip(expected, found) if expected_ids
+            ]
+            measurements.append({
+                key: value,
+                "recall": sum(recalls) / len(recalls) if recalls else 1.0,
+                "qps": len(vectors) / elapsed if elapsed > 0 else float("inf")
+            })
+            logger.debug("Search param %s=%s: %s", key, value, measurements[-1])
+        
+        return measurements
+    
+    def _collection_is_empty(self) -> bool:
+        """Check whether the backend collection has no rows yet"""
+        try:
+            collection = getattr(self.vector_store, 'col', None)
+            return collection is None or collection.num_entities == 0
+        except Exception:
+            return False
+    
+    def _local_index_ready(self) -> bool:
+        """Whether searches can be served from the local mirror"""
+        return (
+            bool(self._mirror.enabled)
+            and self._mirror.index is not None
+            and 0 < self._mirror.index.ntotal < LOCAL_INDEX_MAX_ENTITIES
+        )
+    
+    def _local_index_fresh(self) -> bool:
+        """Whether the backend holds exactly as many rows as the mirror; other writers break this"""
+        collection = getattr(self.vector_store, 'col', None)
+        try:
+            return collection is not None and collection.num_entities == self._mirror.index.ntotal
+        except Exception:
+            return False
+    
+    def _backend_metric(self) -> str:
+        """Distance metric of the backend index (langchain-milvus defaults to L2)"""
+        index_params = getattr(self.vector_store, 'index_params', None)
+        metric = index_params.get("metric_type") if isinstance(index_params, dict) else None
+        return (metric or "L2").upper()
+    
+    async def _run_io(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking vector-store call on the dedicated I/O executor"""
+        return await run_in_executor(self._io_executor, func, *args, **kwargs)
+    
+    async def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with the vector store's embedder, natively async when supported"""
+        embeddings = self.vector_store.embeddings
+        if self._caps['aembed']:
+            return await embeddings.aembed_documents(texts)
+        return await self._run_io(embeddings.embed_documents, texts)
+    
+    def _upsert_embedded(self, batch: List[Document], texts: List[str],
+                         embeddings: List[List[float]]) -> None:
+        """Write pre-computed vectors to the backend, then to the local mirror if enabled"""
+        self.vector_store.add_embeddings(texts, embeddings, [doc.metadata for doc in batch])
+        if self._mirror.enabled:
+            self._mirror_stored(batch, embeddings)
+    
+    def _mirror_stored(self, batch: List[Document], embeddings: List[List[float]]) -> None:
+        """Mirror rows the backend already holds; a failure drops the mirror, never retries the write"""
+        try:
+            self._mirror_add(batch, embeddings)
+        except Exception as e:
+            logger.warning("Local mirror update failed, dropping the mirror: %s", e)
+            with self._mirror.lock:
+                self._drop_local_index()
+    
+    def _mirror_add(self, batch: List[Document], embeddings: List[List[float]]) -> None:
+        """Append already-stored vectors to the local mirror"""
+        vectors = np.vstack(embeddings).astype(np.float32)
+        if self._mirror_metric == "COSINE":
+            faiss.normalize_L2(vectors)
+        
+        with self._mirror.lock:
+            if not self._mirror.enabled:
+                return
+            if self._mirror.index is None:
+                self._mirror.index = self._new_local_index(vectors)
+            self._mirror.index.add(vectors)
+            self._mirror.docs.extend(batch)
             
-            # Method 2: Check if there's a collection attribute
-            if hasattr(self.vector_store, 'collection') and self.vector_store.collection:
-                try:
-                    collection = self.vector_store.collection
-                    stats = {
-                        "collection_name": getattr(collection, 'name', 'N/A'),
-                        "total_entities": getattr(collection, 'num_entities', 0),
-                        "description": getattr(collection, 'description', 'N/A'),
-                    }
-                    return stats
-                except Exception as e:
-                    print(f"⚠️ Collection stats retrieval failed: {e}")
+            # Past the threshold the backend index wins; free the mirror
+            if self._mirror.index.ntotal >= LOCAL_INDEX_MAX_ENTITIES:
+                self._drop_local_index()
+    
+    def _new_local_index(self, sample: "np.ndarray"):
+        """Create an empty local index; int8 indexes are trained on the given vectors"""
+        dim = sample.shape[1]
+        # COSINE vectors are normalized on the way in, so inner product ranks them
+        metric = faiss.METRIC_L2 if self._mirror_metric == "L2" else faiss.METRIC_INNER_PRODUCT
+        if not self._quantize_int8:
+            return faiss.IndexFlat(dim, metric)
+        
+        # One global value range is robust to small training batches
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit_uniform, metric)
+        index.train(sample)
+        return index
+    
+    def _search_local(self, vector: List[float], k: int) -> Optional[List[Document]]:
+        """Exact search on the local mirror; None when it has fallen out of step with the backend"""
+        if not self._local_index_fresh():
+            logger.debug("Local mirror row count differs from the backend, searching the backend")
+            return None
+        query_vector = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        if self._mirror_metric == "COSINE":
+            faiss.normalize_L2(query_vector)
+        
+        with self._mirror.lock:
+            k = min(k, self._mirror.index.ntotal)
+            _, indices = self._mirror.index.search(query_vector, k)
+            return [self._mirror.docs[i] for i in indices[0] if i >= 0]
+    
+    def _remove_local(self, matches: Callable[[Document], bool]) -> None:
+        """Remove rows matching the predicate from the local mirror"""
+        with self._mirror.lock:
+            if self._mirror.index is None:
+                return
             
-            # Method 3: Try to estimate document count through search
-            try:
-                # Execute a simple search to check if there's data
-                test_docs = self.vector_store.similarity_search("test", k=1)
-                if test_docs:
-                    # If search returns results, there's data but can't get exact count
-                    stats = {
-                        "collection_name": getattr(self.vector_store, 'collection_name', 'default_collection'),
-                        "total_entities": "Has data but cannot get exact count",
-                        "description": "Data existence verified through search",
-                        "status": "Has data"
-                    }
-                else:
-                    stats = {
-                        "collection_name": getattr(self.vector_store, 'collection_name', 'default_collection'),
-                        "total_entities": 0,
-                        "description": "Collection is empty or inaccessible",
-                        "status": "Empty collection"
-                    }
-                return stats
-            except Exception as e:
-                print(f"⚠️ Search test failed: {e}")
+            keep = [i for i, doc in enumerate(self._mirror.docs) if not matches(doc)]
+            if len(keep) == len(self._mirror.docs):
+                return
             
-            # Method 4: Return basic information
+            vectors = self._mirror.index.reconstruct_n(0, self._mirror.index.ntotal)
+            index = self._new_local_index(vectors)
+            if keep:
+                index.add(vectors[keep])
+            self._mirror.index = index
+            self._mirror.docs = [self._mirror.docs[i] for i in keep]
+    
+    def _drop_local_index(self) -> None:
+        """Disable the local mirror and release its memory"""
+        self._mirror.enabled = False
+        self._mirror.index = None
+        self._mirror.docs = []
+    
+    def _select_stats_fn(self) -> Callable[[], Dict[str, Any]]:
+        """Pick the one statistics lookup that works for this backend"""
+        vs = self.vector_store
+        # Milvus exposes `col` even before the collection exists (it is None until first insert),
+        # so the decision is structural and costs no RPC per manager
+        if hasattr(vs, 'col'):
+            return self._stats_from_col
+        if hasattr(getattr(vs, 'collection', None), 'num_entities'):
+            return self._stats_from_collection
+        if hasattr(vs, 'similarity_search'):
+            return self._stats_from_probe
+        return self._stats_static
+    
+    def _stats_from_col(self) -> Dict[str, Any]:
+        collection = self.vector_store.col
+        if collection is None:
+            return self._empty_stats()
+        return {
+            "collection_name": collection.name,
+            "total_entities": collection.num_entities,
+            "description": getattr(collection, 'description', 'N/A'),
+        }
+    
+    def _stats_from_collection(self) -> Dict[str, Any]:
+        collection = self.vector_store.collection
+        return {
+            "collection_name": getattr(collection, 'name', 'N/A'),
+            "total_entities": collection.num_entities,
+            "description": getattr(collection, 'description', 'N/A'),
+        }
+    
+    def _stats_from_probe(self) -> Dict[str, Any]:
+        # No count available: estimate through a one-result search
+        if not self.vector_store.similarity_search("test", k=1):
+            return self._empty_stats()
+        return {
+            "collection_name": getattr(self.vector_store, 'collection_name', 'default_collection'),
+            "total_entities": "Has data but cannot get exact count",
+            "description": "Data existence verified through search",
+            "status": "Has data"
+        }
+    
+    def _stats_static(self) -> Dict[str, Any]:
+        return {
+            "collection_name": self.collection_name or getattr(self.vector_store, 'collection_name', 'N/A'),
+            "total_entities": "N/A",
+            "description": "Unable to get statistics",
+            "error": "All statistical methods failed"
+        }
+    
+    def _empty_stats(self) -> Dict[str, Any]:
+        return {
+            "collection_name": getattr(self.vector_store, 'collection_name', 'default_collection'),
+            "total_entities": 0,
+            "description": "Collection is empty or inaccessible",
+            "status": "Empty collection"
+        }
+    
+    def get_collection_stats(self) -> Dict[str, Any]:
+        """Get collection statistics, cached for a few seconds"""
+        cached = self._stats_cache
+        if cached is not None and time.monotonic() - cached[0] < self._stats_ttl:
+            return cached[1]
+        
+        try:
+            stats = self._stats_fn()
+            self._stats_cache = (time.monotonic(), stats)
+            return stats
+        except Exception as e:
+            logger.warning("Collection stats retrieval failed: %s", e)
             return {
                 "collection_name": self.collection_name or getattr(self.vector_store, 'collection_name', 'N/A'),
                 "total_entities": "N/A",
                 "description": "Unable to get statistics",
-                "error": "All statistical methods failed"
-            }
-                
-        except Exception as e:
-            return {
-                "collection_name": self.collection_name or "N/A",
-                "total_entities": "N/A", 
                 "error": f"Failed to get statistics: {str(e)}"
             }
     
+    @staticmethod
+    def _build_expr(filter_metadata: Dict[str, Any]) -> str:
+        """Convert a metadata filter to a Milvus boolean expression"""
+        expr_parts = []
+        for key, value in filter_metadata.items():
+            if isinstance(value, str):
+                # For string values, use exact match with quotes
+                expr_parts.append(f'{key} == "{value}"')
+            elif isinstance(value, (int, float)):
+                expr_parts.append(f'{key} == {value}')
+            else:
+                # Convert other types to string
+                expr_parts.append(f'{key} == "{str(value)}"')
+        
+        # Combine multiple conditions with AND
+        return " and ".join(expr_parts)
+    
     async def delete_by_metadata(self, filter_metadata: Dict[str, Any]) -> Dict[str, Any]:
         """Delete documents by metadata using proper Milvus expressions"""
         try:
-            # Convert metadata filter to Milvus expression format
-            expr_parts = []
-            for key, value in filter_metadata.items():
-                if isinstance(value, str):
-                    # For string values, use exact match with quotes
-                    expr_parts.append(f'{key} == "{value}"')
-                elif isinstance(value, (int, float)):
-                    expr_parts.append(f'{key} == {value}')
-                else:
-                    # Convert other types to string
-                    expr_parts.append(f'{key} == "{str(value)}"')
-            
-            # Combine multiple conditions with AND
-            expr = " and ".join(expr_parts) if expr_parts else ""
+            expr = self._build_expr(filter_metadata)
             
             if not expr:
                 return {
@@ -288,86 +1012,140 @@ class VectorStoreManager:
                     "message": "Delete failed: No valid filter metadata provided"
                 }
             
-            print(f"🗑️ Deleting with expression: {expr}")
+            logger.info("Deleting with expression: %s", expr)
+            
+            result = await self._delete_by_expr(expr)
+            
+            # Keep the local mirror in sync with the backend
+            if result.get("success"):
+                self._remove_local(
+                    lambda doc: all(doc.metadata.get(key) == value for key, value in filter_metadata.items())
+                )
+            elif self._mirror.index is not None:
+                self._drop_local_index()
             
-            # Primary strategy: Use sync method directly in thread pool
+            return result
+                
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "message": f"Delete failed: {str(e)}"
+            }
+    
+    async def delete_by_metadata_many(self, sources: Iterable[str]) -> Dict[str, Any]:
+        """Delete documents of several source files with a single `source in [...]` expression"""
+        sources = list(dict.fromkeys(sources))
+        if not sources:
+            return {
+                "success": False,
+                "error": "No sources provided",
+                "message": "Delete failed: No sources provided"
+            }
+        
+        try:
+            expr = f"source in {json.dumps(sources, ensure_ascii=False)}"
+            logger.info("Deleting %d sources with one expression", len(sources))
+            
+            result = await self._delete_by_expr(expr)
+            
+            if result.get("success"):
+                source_set = set(sources)
+                self._remove_local(lambda doc: doc.metadata.get("source") in source_set)
+                return result
+            
+            # Backend rejected the IN expression: fall back to per-source deletes
+            logger.warning("Batched delete failed, deleting sources one by one")
+            results = await asyncio.gather(
+                *(self.delete_by_metadata({"source": source}) for source in sources)
+            )
+            failed = [source for source, r in zip(sources, results) if not r.get("success")]
+            return {
+                "success": not failed,
+                "message": "Delete successful" if not failed else f"Delete failed for {len(failed)} sources",
+                "failed_sources": failed
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "message": f"Delete failed: {str(e)}"
+            }
+    
+    async def _delete_by_expr(self, expr: str) -> Dict[str, Any]:
+        """Delete documents matching a Milvus boolean expression"""
+        self._stats_cache = None
+        last_error: Optional[Exception] = None
+        
+        # Primary strategy: native async delete in the current loop.
+        # pymilvus' sync delete blocks until the server acks, so the thread pool is only a fallback.
+        if self._caps['adel']:
             try:
-                result = await run_in_thread_pool(
-                    self.vector_store.delete, expr=expr
+                result = await self.vector_store.adelete(expr=expr)
+                return self._delete_result(expr, result)
+            except Exception as async_e:
+                logger.warning("Async delete method failed: %s", async_e)
+                last_error = async_e
+        
+        # Fallback strategy: sync method in thread pool
+        try:
+            result = await self._run_io(
+                self.vector_store.delete, expr=expr
+            )
+            return self._delete_result(expr, result)
+        except Exception as sync_e:
+            logger.warning("Sync delete method failed: %s", sync_e)
+            last_error = sync_e
+        
+        # Last resort: Try with different parameter names
+        if self._caps['delete_by_expr']:
+            try:
+                result = await self._run_io(
+                    self.vector_store.delete_by_expr, expr
                 )
                 return {
                     "success": True,
-                    "message": "Delete successful",
+                    "message": "Delete successful (using delete_by_expr)",
                     "expression": expr,
                     "result": result
                 }
-                
-            except Exception as sync_e:
-                print(f"⚠️ Sync delete method failed: {sync_e}")
-                
-                # Fallback strategy: Check for async method and try in current loop
-                if hasattr(self.vector_store, 'adelete'):
-                    try:
-                        result = await self.vector_store.adelete(expr=expr)
-                        return {
-                            "success": True,
-                            "message": "Delete successful",
-                            "expression": expr,
-                            "result": result
-                        }
-                    except Exception as async_e:
-                        print(f"⚠️ Async delete method also failed: {async_e}")
-                        
-                        # Last resort: Try with different parameter names
-                        try:
-                            # Some versions might use 'filter' parameter with expression string
-                            if hasattr(self.vector_store, 'delete_by_expr'):
-                                result = await run_in_thread_pool(
-                                    self.vector_store.delete_by_expr, expr
-                                )
-                                return {
-                                    "success": True,
-                                    "message": "Delete successful (using delete_by_expr)",
-                                    "expression": expr,
-                                    "result": result
-                                }
-                        except Exception as expr_e:
-                            print(f"⚠️ delete_by_expr also failed: {expr_e}")
-                        
-                        return {
-                            "success": False,
-                            "error": str(async_e),
-                            "expression": expr,
-                            "message": f"Delete failed: {str(async_e)}"
-                        }
-                else:
-                    return {
-                        "success": False,
-                        "error": str(sync_e),
-                        "expression": expr,
-                        "message": f"Delete failed: {str(sync_e)}"
-                    }
-                
-        except Exception as e:
+            except Exception as expr_e:
+                logger.warning("delete_by_expr also failed: %s", expr_e)
+        
+        return {
+            "success": False,
+            "error": str(last_error),
+            "expression": expr,
+            "message": f"Delete failed: {str(last_error)}"
+        }
+    
+    @staticmethod
+    def _delete_result(expr: str, result: Any) -> Dict[str, Any]:
+        """Build the delete response; langchain-milvus returns False when the server rejects it"""
+        if result is False:
             return {
                 "success": False,
-                "error": str(e),
-                "message": f"Delete failed: {str(e)}"
+                "error": "Backend rejected the delete",
+                "expression": expr,
+                "message": "Delete failed: Backend rejected the delete"
             }
+        return {
+            "success": True,
+            "message": "Delete successful",
+            "expression": expr,
+            "result": result
+        }
     
     async def update_documents(self, documents: List[Document]) -> Dict[str, Any]:
         """Update documents (delete then add)"""
         try:
             # Extract source files of documents to be updated
-            sources = set()
-            for doc in documents:
-                source = doc.metadata.get("source")
-                if source:
-                    sources.add(source)
+            sources = {source for doc in documents if (source := doc.metadata.get("source"))}
             
-            # Delete old versions
-            for source in sources:
-                await self.delete_by_metadata({"source": source})
+            # Delete old versions in one round-trip
+            if sources:
+                await self.delete_by_metadata_many(sources)
             
             # Add new versions
             result = await self.add_documents(documents)
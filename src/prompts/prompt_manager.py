@@ -3,67 +3,226 @@ Prompt Management System - Supporting configurable and templated prompts
 """
 
 import json
+import logging
+import os
+import string
+import sys
+import threading
 import yaml
-import re
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Iterable, Optional, List
 from datetime import datetime
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, fields
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: journal appends are not locked across processes
+    fcntl = None
 
 from config.settings import get_settings
+from src.utils.time_utils import now_iso
 
+try:
+    from yaml import CSafeLoader as _YamlLoader, CSafeDumper as _YamlDumper
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as _YamlLoader, SafeDumper as _YamlDumper
 
-@dataclass
-class PromptTemplate:
-    """Prompt template"""
-    name: str
-    version: str
-    description: str
-    template: str
-    variables: List[str]
-    category: str = "general"
-    created_at: str = ""
-    updated_at: str = ""
-    
-    def __post_init__(self):
-        if not self.created_at:
-            self.created_at = datetime.now().isoformat()
-        self.updated_at = datetime.now().isoformat()
-    
-    def render(self, **kwargs) -> str:
-        """Render prompt template"""
-        try:
-            return self.template.format(**kwargs)
-        except KeyError as e:
-            missing_var = str(e).strip("'")
-            raise ValueError(f"Template variable missing: {missing_var}. Required variables: {self.variables}")
+logger = logging.getLogger(__name__)
 
 
-class PromptManager:
-    """Prompt manager"""
+# Rendered prompts kept per manager; kwargs above the size limit are never cached
+RENDER_CACHE_SIZE = 256
+RENDER_CACHE_MAX_CHARS = 64 * 1024
+
+_FORMATTER = string.Formatter()
+_CACHEABLE_TYPES = (str, int, float, bool)
+_CONVERTERS = {None: None, "s": str, "r": repr, "a": ascii}
+
+# Custom prompt edits go to an append-only journal; it is folded into the YAML
+# snapshot once it holds this many times more entries than there are prompts
+JOURNAL_COMPACT_RATIO = 2
+
+# Detected languages memoized for texts up to this length
+LANGUAGE_CACHE_SIZE = 1024
+LANGUAGE_CACHE_MAX_CHARS = 1024
+
+# Language-adaptive replacement for each base template
+DEFAULT_ADAPTIVE_TEMPLATE = "rag_qa_adaptive"
+_ADAPTIVE_TEMPLATES = {"rag_qa": DEFAULT_ADAPTIVE_TEMPLATE}
+
+def _json_dumps(data: Any) -> str:
+    """Indented JSON text, via orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode("utf-8")
+    return json.dumps(data, ensure_ascii=False, indent=2)
+
+
+# Prompt directories already created by this process
+_KNOWN_DIRS = set()
+
+# Parsed custom prompt files keyed by resolved path -> (mtime_ns, size, data)
+_YAML_CACHE: Dict[str, tuple] = {}
+_YAML_CACHE_LOCK = threading.Lock()
+
+
+def _load_yaml_cached(path: Path) -> Any:
+    """Parse a YAML file, reusing the previous result while mtime and size are unchanged"""
+    stat = path.stat()
+    key = str(path.resolve())
+    with _YAML_CACHE_LOCK:
+        cached = _YAML_CACHE.get(key)
+    if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
     
-    def __init__(self, prompts_dir: str = None):
-        self.settings = get_settings()
-        self.prompts_dir = Path(prompts_dir or "config/prompts")
-        self.prompts_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Built-in prompt templates
-        self.built_in_prompts = {}
-        self._load_built_in_prompts()
-        
-        # User custom prompts
-        self.custom_prompts = {}
-        self._load_custom_prompts()
+    with open(path, 'r', encoding='utf-8') as f:
+        data = yaml.load(f, Loader=_YamlLoader)
+    with _YAML_CACHE_LOCK:
+        _YAML_CACHE[key] = (stat.st_mtime_ns, stat.st_size, data)
+    return data
+
+
+def _compile_template(template: str) -> Optional[List[tuple]]:
+    """Pre-parse a template into (literal, field, format_spec, converter) segments.
+
+    Returns None when a field needs the full str.format machinery
+    (positional, attribute/index access or nested format specs).
+    """
+    segments = []
+    for literal, field_name, format_spec, conversion in _FORMATTER.parse(template):
+        if field_name is None:
+            segments.append((literal, None, "", None))
+            continue
+        if not field_name.isidentifier() or "{" in format_spec or conversion not in _CONVERTERS:
+            return None
+        segments.append((literal, sys.intern(field_name), format_spec, _CONVERTERS[conversion]))
+    return segments
+
+
+_ASCII_LETTERS = string.ascii_letters.encode("ascii")
+_ASCII_WORD = _ASCII_LETTERS + string.digits.encode("ascii") + b"_"
+
+
+def _count_scripts(text: str) -> tuple:
+    """Count (chinese, english, japanese, korean, word) characters in one pass"""
+    if text.isascii():
+        # Common English case: two C-level deletes instead of a Python loop
+        data = text.encode("ascii")
+        letters = len(data) - len(data.translate(None, _ASCII_LETTERS))
+        words = len(data) - len(data.translate(None, _ASCII_WORD))
+        return 0, letters, 0, 0, words
+    chinese = english = japanese = korean = other = 0
+    for code in map(ord, text):
+        if 0x4e00 <= code <= 0x9fff:
+            chinese += 1
+        elif code < 0x80:
+            if 0x61 <= code <= 0x7a or 0x41 <= code <= 0x5a:
+                english += 1
+            elif 0x30 <= code <= 0x39 or code == 0x5f:
+                other += 1
+        elif 0x3040 <= code <= 0x30ff:
+            japanese += 1
+        elif 0xac00 <= code <= 0xd7af:
+            korean += 1
+        elif chr(code).isalnum():
+            # Matches what the regex \w counted for every other script
+            other += 1
+    return chinese, english, japanese, korean, chinese + english + japanese + korean + other
+
+
+def _template_fields(template: str) -> List[str]:
+    """Top-level variable names used by a template, in first-use order"""
+    names: Dict[str, None] = {}
+    for _, field_name, format_spec, _ in _FORMATTER.parse(template):
+        if field_name:
+            name = field_name.split(".", 1)[0].split("[", 1)[0]
+            if name and not name.isdigit():
+                names.setdefault(sys.intern(name))
+        if format_spec and "{" in format_spec:
+            for name in _template_fields(format_spec):
+                names.setdefault(name)
+    return list(names)
+
+
+def _build_renderer(template: str):
+    """Generate a render function specialized to one template.
+
+    The segment loop is unrolled into a single join expression, so rendering
+    does no per-segment branching. Literals, specs and converters are bound
+    as globals of the generated function rather than spliced into its source.
+    """
+    segments = _compile_template(template)
+    if segments is None:
+        return lambda kw: template.format(**kw)
     
-    def _load_built_in_prompts(self):
-        """Load built-in prompt templates"""
-        
-        # RAG Q&A prompt (supports Markdown)
-        self.built_in_prompts["rag_qa"] = PromptTemplate(
-            name="rag_qa",
-            version="1.0",
-            description="Q&A prompt based on knowledge base and web search, supports Markdown format",
-            template="""You are a professional AI assistant capable of answering user questions based on knowledge base documents and web search results.
+    namespace: Dict[str, Any] = {"format": format}
+    parts = []
+    for i, (literal, field_name, format_spec, converter) in enumerate(segments):
+        if literal:
+            namespace[f"L{i}"] = literal
+            parts.append(f"L{i}")
+        if field_name is None:
+            continue
+        value = f"kw[{field_name!r}]"
+        if converter is not None:
+            namespace[f"C{i}"] = converter
+            value = f"C{i}({value})"
+        namespace[f"S{i}"] = format_spec
+        parts.append(f"format({value}, S{i})")
+    source = f"def render(kw):\n    return ''.join([{', '.join(parts)}])\n"
+    exec(source, namespace)
+    return namespace["render"]
+
+
+def _detect_language(text: str) -> str:
+    """Classify text as zh/en/ja/ko by character-script ratios"""
+    # Remove whitespace
+    text = text.strip()
+    if not text:
+        return "unknown"
+    
+    chinese_chars, english_chars, japanese_chars, korean_chars, total_chars = _count_scripts(text)
+    
+    if total_chars == 0:
+        return "unknown"
+    
+    # Calculate character ratios for each language
+    chinese_ratio = chinese_chars / total_chars
+    english_ratio = english_chars / total_chars  
+    japanese_ratio = japanese_chars / total_chars
+    korean_ratio = korean_chars / total_chars
+    
+    # Determine primary language
+    if chinese_ratio > 0.3:
+        return "zh"
+    elif english_ratio > 0.7:
+        return "en"
+    elif japanese_ratio > 0.2:
+        return "ja" 
+    elif korean_ratio > 0.2:
+        return "ko"
+    elif english_ratio > 0.4:
+        return "en"
+    else:
+        return "zh"  # Default to Chinese
+
+
+_detect_language_cached = lru_cache(maxsize=LANGUAGE_CACHE_SIZE)(_detect_language)
+
+
+# Built-in prompt specs, materialized into PromptTemplate objects on first use
+_BUILTIN_SPECS: Dict[str, Dict[str, Any]] = {
+    # RAG Q&A prompt (supports Markdown)
+    "rag_qa": {
+        "version": "1.0",
+        "description": "Q&A prompt based on knowledge base and web search, supports Markdown format",
+        "template": """You are a professional AI assistant capable of answering user questions based on knowledge base documents and web search results.
 
 ## Context Information
 
@@ -93,16 +252,15 @@ class PromptManager:
 
 ## Answer:
 Please provide an accurate, comprehensive and well-formatted answer based on the above context information using Markdown format.""",
-            variables=["knowledge_context", "web_context", "query"],
-            category="rag"
-        )
-        
-        # Knowledge-only Q&A (supports Markdown)
-        self.built_in_prompts["knowledge_only"] = PromptTemplate(
-            name="knowledge_only", 
-            version="1.0",
-            description="Q&A prompt based only on knowledge base, supports Markdown format",
-            template="""You are a professional document assistant, specializing in answering user questions based on knowledge base document content.
+        "variables": ["knowledge_context", "web_context", "query"],
+        "category": "rag"
+    },
+
+    # Knowledge-only Q&A (supports Markdown)
+    "knowledge_only": {
+        "version": "1.0",
+        "description": "Q&A prompt based only on knowledge base, supports Markdown format",
+        "template": """You are a professional document assistant, specializing in answering user questions based on knowledge base document content.
 
 ## Knowledge Base Context:
 {knowledge_context}
@@ -123,16 +281,15 @@ Please provide an accurate, comprehensive and well-formatted answer based on the
 {query}
 
 ## Document-based Answer:""",
-            variables=["knowledge_context", "query"],
-            category="knowledge"
-        )
-        
-        # Web search Q&A (supports Markdown)
-        self.built_in_prompts["web_only"] = PromptTemplate(
-            name="web_only",
-            version="1.0", 
-            description="Q&A prompt based only on web search, supports Markdown format",
-            template="""You are an information research assistant, answering user questions based on the latest web search results.
+        "variables": ["knowledge_context", "query"],
+        "category": "knowledge"
+    },
+
+    # Web search Q&A (supports Markdown)
+    "web_only": {
+        "version": "1.0",
+        "description": "Q&A prompt based only on web search, supports Markdown format",
+        "template": """You are an information research assistant, answering user questions based on the latest web search results.
 
 ## Web Search Results:
 {web_context}
@@ -153,16 +310,15 @@ Please provide an accurate, comprehensive and well-formatted answer based on the
 {query}
 
 ## Search-based Answer:""",
-            variables=["web_context", "query"],
-            category="web"
-        )
-        
-        # Query analysis prompt
-        self.built_in_prompts["query_analysis"] = PromptTemplate(
-            name="query_analysis",
-            version="1.0",
-            description="For analyzing user query intent and type",
-            template="""Please analyze the following user query to determine its type and retrieval strategy.
+        "variables": ["web_context", "query"],
+        "category": "web"
+    },
+
+    # Query analysis prompt
+    "query_analysis": {
+        "version": "1.0",
+        "description": "For analyzing user query intent and type",
+        "template": """Please analyze the following user query to determine its type and retrieval strategy.
 
 ## User Query:
 {query}
@@ -184,16 +340,15 @@ Please return analysis results in JSON format:
     "keywords": ["keyword1", "keyword2"],
     "reasoning": "analysis reasoning"
 }}""",
-            variables=["query"],
-            category="analysis"
-        )
-        
-        # Information fusion prompt
-        self.built_in_prompts["information_fusion"] = PromptTemplate(
-            name="information_fusion",
-            version="1.0",
-            description="For fusing multi-source information",
-            template="""Please integrate and deduplicate the following information from different sources.
+        "variables": ["query"],
+        "category": "analysis"
+    },
+
+    # Information fusion prompt
+    "information_fusion": {
+        "version": "1.0",
+        "description": "For fusing multi-source information",
+        "template": """Please integrate and deduplicate the following information from different sources.
 
 ## Knowledge Base Information:
 {knowledge_info}
@@ -212,16 +367,15 @@ Please provide integrated information in the following format:
 - Core information point 1 [Source: Knowledge Base/Web]
 - Core information point 2 [Source: Knowledge Base/Web]
 ...""",
-            variables=["knowledge_info", "web_info"],
-            category="fusion"
-        )
+        "variables": ["knowledge_info", "web_info"],
+        "category": "fusion"
+    },
 
-        # Language detection prompt
-        self.built_in_prompts["language_detection"] = PromptTemplate(
-            name="language_detection",
-            version="1.0",
-            description="Detect text language type",
-            template="""Please detect the language type of the following text:
+    # Language detection prompt
+    "language_detection": {
+        "version": "1.0",
+        "description": "Detect text language type",
+        "template": """Please detect the language type of the following text:
 
 Text content: {text}
 
@@ -233,16 +387,15 @@ Please return language code:
 - other: Other languages
 
 Return only the language code, no other content.""",
-            variables=["text"],
-            category="analysis"
-        )
-        
-        # Smart language-adaptive RAG prompt (supports Markdown)
-        self.built_in_prompts["rag_qa_adaptive"] = PromptTemplate(
-            name="rag_qa_adaptive",
-            version="1.0",
-            description="RAG prompt that automatically adapts response language based on user question language, supports Markdown format", 
-            template="""You are a professional AI assistant. Please analyze the user's question language and respond in the same language.
+        "variables": ["text"],
+        "category": "analysis"
+    },
+
+    # Smart language-adaptive RAG prompt (supports Markdown)
+    "rag_qa_adaptive": {
+        "version": "1.0",
+        "description": "RAG prompt that automatically adapts response language based on user question language, supports Markdown format",
+        "template": """You are a professional AI assistant. Please analyze the user's question language and respond in the same language.
 
 If the user asks in English, respond in English.
 If the user asks in Chinese, respond in Chinese.
@@ -276,35 +429,189 @@ If the user asks in other languages, try to respond in that language or English.
 
 ## Response:
 [Please respond in the same language as the user's question above, using markdown format for better presentation]""",
-            variables=["knowledge_context", "web_context", "query"],
-            category="rag"
-        )
+        "variables": ["knowledge_context", "web_context", "query"],
+        "category": "rag"
+    },
+}
+
+
+# dataclass(slots=True) needs Python 3.10; older interpreters keep a __dict__
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+class _CompiledTemplate:
+    """Slots for state derived from the template by PromptTemplate._compile.
+
+    Kept outside the dataclass fields so asdict() and API serialization
+    only ever see the public prompt data.
+    """
+    __slots__ = ("_compiled_from", "_render_fn", "_fields", "_required")
+
+
+@dataclass(**_SLOTS)
+class PromptTemplate(_CompiledTemplate):
+    """Prompt template"""
+    name: str
+    version: str
+    description: str
+    template: str
+    variables: List[str]
+    category: str = "general"
+    created_at: str = ""
+    updated_at: str = ""
+    
+    def __post_init__(self):
+        # Stamp only missing timestamps so reloading keeps the saved ones
+        if not self.created_at:
+            self.created_at = now_iso()
+        if not self.updated_at:
+            self.updated_at = self.created_at
+        # Shared by every prompt in a category, and used as render kwargs keys
+        self.category = sys.intern(self.category)
+        self._compile()
+        # The template is authoritative; a stale declaration would only mislead callers
+        if set(self.variables) != self._required:
+            logger.warning("Prompt '%s' declares variables %s, template uses %s",
+                           self.name, self.variables, self._fields)
+            self.variables = list(self._fields)
+        else:
+            self.variables = [sys.intern(v) for v in self.variables]
+    
+    def _compile(self):
+        # Parsed once per template string instead of on every render
+        object.__setattr__(self, "_compiled_from", self.template)
+        object.__setattr__(self, "_render_fn", _build_renderer(self.template))
+        object.__setattr__(self, "_fields", _template_fields(self.template))
+        object.__setattr__(self, "_required", frozenset(self._fields))
+    
+    def render(self, **kwargs) -> str:
+        """Render prompt template"""
+        # Templates can be replaced in place (update_custom_prompt), so recompile on change
+        if self._compiled_from is not self.template:
+            self._compile()
+        missing = self._required.difference(kwargs)
+        if missing:
+            missing_var = next(name for name in self._fields if name in missing)
+            raise ValueError(f"Template variable missing: {missing_var}. Required variables: {self.variables}")
+        try:
+            return self._render_fn(kwargs)
+        except KeyError as e:
+            missing_var = str(e).strip("'")
+            raise ValueError(f"Template variable missing: {missing_var}. Required variables: {self.variables}")
+
+
+# Built-in templates are read-only, so one instance per process is shared by every manager
+_BUILTIN_PROMPTS: Dict[str, PromptTemplate] = {}
+
+_FIELD_NAMES = tuple(f.name for f in fields(PromptTemplate))
+_TEMPLATE_FIELDS = frozenset(_FIELD_NAMES)
+
+
+def _prompt_to_dict(prompt: PromptTemplate) -> Dict[str, Any]:
+    """Shallow field dict; unlike asdict it does not deep-copy the template data"""
+    return {name: getattr(prompt, name) for name in _FIELD_NAMES}
+
+
+class PromptManager:
+    """Prompt manager"""
+    
+    def __init__(self, prompts_dir: str = None):
+        self.settings = get_settings()
+        self.prompts_dir = Path(prompts_dir or "config/prompts")
+        prompts_dir_key = os.path.abspath(self.prompts_dir)
+        if prompts_dir_key not in _KNOWN_DIRS:
+            self.prompts_dir.mkdir(parents=True, exist_ok=True)
+            _KNOWN_DIRS.add(prompts_dir_key)
+        
+        # Built-in prompt templates, filled lazily from _BUILTIN_SPECS
+        self.built_in_prompts: Dict[str, PromptTemplate] = {}
+        
+        # User custom prompts: YAML snapshot plus replayed edit journal
+        self.custom_prompts = {}
+        self._prompts_file = self.prompts_dir / "custom_prompts.yaml"
+        self._journal_file = self.prompts_dir / "custom_prompts.jsonl"
+        self._journal_lock = threading.Lock()
+        self._journal_entries = 0
+        self._load_custom_prompts()
+        
+        # LRU of rendered text; the version is bumped whenever custom prompts change
+        self._render_cache: "OrderedDict[tuple, str]" = OrderedDict()
+        self._render_cache_lock = threading.Lock()
+        self._cache_version = 0
+        
+        # Merged built-in + custom views, built on first listing and then kept
+        # current by the mutation methods
+        self._merged_view: Optional[Dict[str, PromptTemplate]] = None
+        self._by_category: Optional[Dict[str, List[PromptTemplate]]] = None
+        
+        # (cache version, JSON text) of the last export
+        self._export_cache: Optional[tuple] = None
+    
+    def _get_builtin(self, name: str) -> Optional[PromptTemplate]:
+        """Materialize a built-in prompt template on first access"""
+        prompt = self.built_in_prompts.get(name)
+        if prompt is None and name in _BUILTIN_SPECS:
+            prompt = _BUILTIN_PROMPTS.get(name)
+            if prompt is None:
+                prompt = _BUILTIN_PROMPTS.setdefault(name, PromptTemplate(name=name, **_BUILTIN_SPECS[name]))
+            self.built_in_prompts[name] = prompt
+        return prompt
+    
+    def _all_builtins(self) -> Dict[str, PromptTemplate]:
+        """All built-in templates, materializing any not yet used"""
+        for name in _BUILTIN_SPECS:
+            self._get_builtin(name)
+        return self.built_in_prompts
     
     def _load_custom_prompts(self):
         """Load user custom prompts"""
-        prompts_file = self.prompts_dir / "custom_prompts.yaml"
+        prompts_file = self._prompts_file
         
         if prompts_file.exists():
             try:
-                with open(prompts_file, 'r', encoding='utf-8') as f:
-                    data = yaml.safe_load(f)
-                    
-                for prompt_data in data.get("prompts", []):
-                    prompt = PromptTemplate(**prompt_data)
-                    self.custom_prompts[prompt.name] = prompt
-                    
-                print(f"✅ Loaded {len(self.custom_prompts)} custom prompts")
+                data = _load_yaml_cached(prompts_file)
+                
+                # Copy lists so the cached parse is never mutated through a prompt
+                prompts = [PromptTemplate(**{k: list(v) if isinstance(v, list) else v
+                                             for k, v in prompt_data.items()})
+                           for prompt_data in (data.get("prompts") or ())]
+                self.custom_prompts.update({prompt.name: prompt for prompt in prompts})
                 
             except Exception as e:
-                print(f"⚠️ Failed to load custom prompts: {e}")
+                logger.warning("Failed to load custom prompts: %s", e)
+        
+        self._replay_journal()
+        if self.custom_prompts:
+            logger.info("Loaded %d custom prompts", len(self.custom_prompts))
+    
+    def _replay_journal(self):
+        """Apply edits recorded since the last snapshot"""
+        if not self._journal_file.exists():
+            return
+        try:
+            with open(self._journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn final line from an interrupted append
+                    self._journal_entries += 1
+                    if entry["op"] == "put":
+                        prompt = PromptTemplate(**entry["prompt"])
+                        self.custom_prompts[prompt.name] = prompt
+                    elif entry["op"] == "delete":
+                        self.custom_prompts.pop(entry["name"], None)
+        except Exception as e:
+            logger.warning("Failed to replay custom prompt journal: %s", e)
     
     def get_prompt(self, name: str, prefer_custom: bool = True) -> Optional[PromptTemplate]:
         """Get prompt template"""
         if prefer_custom and name in self.custom_prompts:
             return self.custom_prompts[name]
         
-        if name in self.built_in_prompts:
-            return self.built_in_prompts[name]
+        prompt = self._get_builtin(name)
+        if prompt is not None:
+            return prompt
             
         if name in self.custom_prompts:
             return self.custom_prompts[name]
@@ -313,33 +620,101 @@ If the user asks in other languages, try to respond in that language or English.
     
     def render_prompt(self, name: str, **kwargs) -> str:
         """Render prompt"""
+        key = self._render_key(name, kwargs)
+        if key is not None:
+            with self._render_cache_lock:
+                cached = self._render_cache.get(key)
+                if cached is not None:
+                    self._render_cache.move_to_end(key)
+                    return cached
+        
         prompt = self.get_prompt(name)
         if not prompt:
             raise ValueError(f"Prompt template not found: {name}")
         
-        return prompt.render(**kwargs)
+        rendered = prompt.render(**kwargs)
+        if key is not None:
+            with self._render_cache_lock:
+                self._render_cache[key] = rendered
+                if len(self._render_cache) > RENDER_CACHE_SIZE:
+                    self._render_cache.popitem(last=False)
+        return rendered
+    
+    def render_many(self, name: str, kwargs_list: Iterable[Dict[str, Any]]) -> List[str]:
+        """Render one prompt for many argument sets, looking the template up once"""
+        prompt = self.get_prompt(name)
+        if not prompt:
+            raise ValueError(f"Prompt template not found: {name}")
+        
+        # Batch inputs are rarely repeated, so the render cache is bypassed
+        render = prompt.render
+        return [render(**kwargs) for kwargs in kwargs_list]
+    
+    def _render_key(self, name: str, kwargs: Dict[str, Any]) -> Optional[tuple]:
+        """Cache key for a render, or None when the arguments are not worth caching"""
+        size = 0
+        for value in kwargs.values():
+            if not isinstance(value, _CACHEABLE_TYPES):
+                return None
+            if isinstance(value, str):
+                size += len(value)
+        if size > RENDER_CACHE_MAX_CHARS:
+            return None
+        # The type is part of each entry: 1, True and 1.0 are equal but render differently
+        return (name, self._cache_version,
+                tuple(sorted((key, type(value), value) for key, value in kwargs.items())))
+    
+    def clear_render_cache(self):
+        """Drop all memoized renders, e.g. after editing custom prompt files externally"""
+        with self._render_cache_lock:
+            self._cache_version += 1
+            self._render_cache.clear()
+    
+    def _all_prompts(self) -> Dict[str, PromptTemplate]:
+        """Built-in prompts overridden by custom ones, cached until the next mutation"""
+        if self._merged_view is None:
+            merged = {**self._all_builtins(), **self.custom_prompts}
+            by_category: Dict[str, List[PromptTemplate]] = {}
+            for prompt in merged.values():
+                by_category.setdefault(prompt.category, []).append(prompt)
+            self._merged_view = merged
+            self._by_category = by_category
+        return self._merged_view
+    
+    def _reindex(self, name: str):
+        """Refresh one name in the merged views after its custom prompt changed"""
+        if self._merged_view is None:
+            return
+        old = self._merged_view.pop(name, None)
+        if old is not None:
+            # Located by identity: an update may already have changed old.category
+            for category, prompts in self._by_category.items():
+                if any(p is old for p in prompts):
+                    prompts[:] = [p for p in prompts if p is not old]
+                    if not prompts:
+                        del self._by_category[category]
+                    break
+        prompt = self.custom_prompts.get(name) or self._get_builtin(name)
+        if prompt is not None:
+            self._merged_view[name] = prompt
+            self._by_category.setdefault(prompt.category, []).append(prompt)
     
     def list_prompts(self, category: str = None) -> Dict[str, List[PromptTemplate]]:
         """List all prompts"""
-        all_prompts = {**self.built_in_prompts, **self.custom_prompts}
+        self._all_prompts()
         
         if category:
-            filtered = {k: v for k, v in all_prompts.items() if v.category == category}
-            return {"prompts": list(filtered.values())}
+            return {"prompts": list(self._by_category.get(category, ()))}
         
         # Group by category
-        categories = {}
-        for prompt in all_prompts.values():
-            if prompt.category not in categories:
-                categories[prompt.category] = []
-            categories[prompt.category].append(prompt)
-        
-        return categories
+        return {name: list(prompts) for name, prompts in self._by_category.items()}
     
     def add_custom_prompt(self, prompt: PromptTemplate) -> bool:
         """Add custom prompt"""
         self.custom_prompts[prompt.name] = prompt
-        return self._save_custom_prompts()
+        self.clear_render_cache()
+        self._reindex(prompt.name)
+        return self._append_journal({"op": "put", "prompt": _prompt_to_dict(prompt)})
     
     def update_custom_prompt(self, name: str, **updates) -> bool:
         """Update custom prompt"""
@@ -348,89 +723,123 @@ If the user asks in other languages, try to respond in that language or English.
         
         prompt = self.custom_prompts[name]
         for key, value in updates.items():
-            if hasattr(prompt, key):
+            # Only dataclass fields; methods and private state are not updatable
+            if key in _TEMPLATE_FIELDS:
                 setattr(prompt, key, value)
         
         prompt.updated_at = datetime.now().isoformat()
-        return self._save_custom_prompts()
+        self.clear_render_cache()
+        self._reindex(name)
+        return self._append_journal({"op": "put", "prompt": _prompt_to_dict(prompt)})
     
     def delete_custom_prompt(self, name: str) -> bool:
         """Delete custom prompt"""
         if name in self.custom_prompts:
             del self.custom_prompts[name]
-            return self._save_custom_prompts()
+            self.clear_render_cache()
+            self._reindex(name)
+            return self._append_journal({"op": "delete", "name": name})
         return False
     
+    def _append_journal(self, entry: Dict[str, Any]) -> bool:
+        """Record one edit, compacting once the journal outgrows the snapshot"""
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._journal_lock:
+            try:
+                with open(self._journal_file, 'a', encoding='utf-8') as f:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_EX)
+                    f.write(line)
+                self._journal_entries += 1
+            except Exception as e:
+                logger.exception("Failed to save prompts: %s", e)
+                return False
+        
+        if self._journal_entries > JOURNAL_COMPACT_RATIO * max(len(self.custom_prompts), 1):
+            return self.compact()
+        return True
+    
+    def compact(self) -> bool:
+        """Fold the shared journal into the YAML snapshot and clear it, under an exclusive file lock"""
+        with self._journal_lock:
+            try:
+                with open(self._journal_file, 'a+', encoding='utf-8') as f:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_EX)
+                    seen_size = os.fstat(f.fileno()).st_size
+                    # Rebuild from disk: other processes may have appended or compacted since our load
+                    self._reload_custom_prompts()
+                    if not self._save_custom_prompts():
+                        return False
+                    # Without flock another writer may have appended meanwhile; keep what we did not replay
+                    if os.fstat(f.fileno()).st_size == seen_size:
+                        f.truncate(0)
+                        self._journal_entries = 0
+            except Exception as e:
+                logger.warning("Failed to compact prompt journal: %s", e)
+                return False
+            return True
+    
+    def _reload_custom_prompts(self):
+        """Replace in-memory custom prompts with the snapshot plus journal on disk"""
+        self.custom_prompts = {}
+        self._journal_entries = 0
+        self._load_custom_prompts()
+        self.clear_render_cache()
+        self._merged_view = None
+        self._by_category = None
+    
     def _save_custom_prompts(self) -> bool:
         """Save custom prompts to file"""
         try:
             prompts_data = {
-                "prompts": [asdict(prompt) for prompt in self.custom_prompts.values()],
+                "prompts": [_prompt_to_dict(prompt) for prompt in self.custom_prompts.values()],
                 "saved_at": datetime.now().isoformat()
             }
             
-            prompts_file = self.prompts_dir / "custom_prompts.yaml"
-            with open(prompts_file, 'w', encoding='utf-8') as f:
-                yaml.dump(prompts_data, f, ensure_ascii=False, indent=2)
+            prompts_file = self._prompts_file
+            with _YAML_CACHE_LOCK:
+                _YAML_CACHE.pop(str(prompts_file.resolve()), None)
+            # Write beside the target and swap in, so readers never see a partial file
+            tmp_file = prompts_file.with_name(prompts_file.name + ".tmp")
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                yaml.dump(prompts_data, f, Dumper=_YamlDumper, allow_unicode=True, indent=2,
+                          default_flow_style=False, sort_keys=False)
+            os.replace(tmp_file, prompts_file)
             
             return True
             
         except Exception as e:
-            print(f"❌ Failed to save prompts: {e}")
+            logger.exception("Failed to save prompts: %s", e)
             return False
     
     def detect_language(self, text: str) -> str:
         """Simple language detection function"""
-        # Remove whitespace
-        text = text.strip()
-        if not text:
-            return "unknown"
-        
-        # Count different character types
-        chinese_chars = len(re.findall(r'[\u4e00-\u9fff]', text))
-        english_chars = len(re.findall(r'[a-zA-Z]', text))
-        japanese_chars = len(re.findall(r'[\u3040-\u309f\u30a0-\u30ff]', text))
-        korean_chars = len(re.findall(r'[\uac00-\ud7af]', text))
-        
-        total_chars = len(re.findall(r'[\w\u4e00-\u9fff\u3040-\u309f\u30a0-\u30ff\uac00-\ud7af]', text))
-        
-        if total_chars == 0:
-            return "unknown"
-        
-        # Calculate character ratios for each language
-        chinese_ratio = chinese_chars / total_chars
-        english_ratio = english_chars / total_chars  
-        japanese_ratio = japanese_chars / total_chars
-        korean_ratio = korean_chars / total_chars
-        
-        # Determine primary language
-        if chinese_ratio > 0.3:
-            return "zh"
-        elif english_ratio > 0.7:
-            return "en"
-        elif japanese_ratio > 0.2:
-            return "ja" 
-        elif korean_ratio > 0.2:
-            return "ko"
-        elif english_ratio > 0.4:
-            return "en"
-        else:
-            return "zh"  # Default to Chinese
+        # Queries are re-detected per request (chat API, streaming), so short ones are memoized
+        if len(text) <= LANGUAGE_CACHE_MAX_CHARS:
+            return _detect_language_cached(text)
+        return _detect_language(text)
     
     def select_adaptive_prompt(self, query: str, base_template: str = "rag_qa") -> str:
         """Select appropriate prompt template based on query language"""
-        detected_lang = self.detect_language(query)
-        
-        # If English query, use language-adaptive template
-        if detected_lang == "en":
-            return "rag_qa_adaptive"
-        # For other languages or Chinese, use adaptive template to ensure language matching
-        else:
-            return "rag_qa_adaptive"
+        # The adaptive template matches the query language itself, so every
+        # language maps to the same template and no detection pass is needed
+        return _ADAPTIVE_TEMPLATES.get(base_template, DEFAULT_ADAPTIVE_TEMPLATE)
     
-    def export_prompts(self, output_file: str = None) -> str:
-        """Export all prompts"""
-        all_prompts = {**self.built_in_prompts, **self.custom_prompts}
+    def export_prompts(self, output_file: str = None, return_str: bool = True) -> Optional[str]:
+        """Export all prompts
+        
+        Returns the export as JSON text; pass return_str=False with an
+        output_file to skip building it. Without an output_file, the text from
+        the previous export is reused until a custom prompt changes.
+        """
+        if not output_file and self._export_cache is not None:
+            version, cached = self._export_cache
+            if version == self._cache_version:
+                return cached
+        
+        version = self._cache_version
+        all_prompts = self._all_prompts()
         
         export_data = {
             "export_info": {
@@ -438,29 +847,49 @@ If the user asks in other languages, try to respond in that language or English.
                 "total_prompts": len(all_prompts),
                 "categories": list(set(p.category for p in all_prompts.values()))
             },
-            "prompts": [asdict(prompt) for prompt in all_prompts.values()]
+            "prompts": [_prompt_to_dict(prompt) for prompt in all_prompts.values()]
         }
         
+        text = None
         if output_file:
             output_path = Path(output_file)
             with open(output_path, 'w', encoding='utf-8') as f:
                 if output_path.suffix.lower() == '.json':
-                    json.dump(export_data, f, ensure_ascii=False, indent=2)
+                    text = _json_dumps(export_data)
+                    f.write(text)
                 else:
-                    yaml.dump(export_data, f, ensure_ascii=False, indent=2)
+                    yaml.dump(export_data, f, Dumper=_YamlDumper, allow_unicode=True, indent=2,
+                              default_flow_style=False, sort_keys=False)
         
-        return json.dumps(export_data, ensure_ascii=False, indent=2)
+        if not return_str and output_file:
+            return None
+        if text is None:
+            text = _json_dumps(export_data)
+        self._export_cache = (version, text)
+        return text
 
 
-# Global prompt manager instance
-prompt_manager = PromptManager()
+# Global prompt manager instance, created on first use
+_prompt_manager: Optional[PromptManager] = None
+_prompt_manager_lock = threading.Lock()
 
 
 def get_prompt_manager() -> PromptManager:
     """Get prompt manager instance"""
-    return prompt_manager
+    global _prompt_manager
+    if _prompt_manager is None:
+        with _prompt_manager_lock:
+            if _prompt_manager is None:
+                _prompt_manager = PromptManager()
+    return _prompt_manager
 
 
 def render_prompt(name: str, **kwargs) -> str:
     """Convenient function for quick prompt rendering"""
-    return prompt_manager.render_prompt(name, **kwargs)
\ No newline at end of file
+    return get_prompt_manager().render_prompt(name, **kwargs)
+
+
+def clear_prompt_cache():
+    """Clear the global manager's rendered-prompt cache"""
+    if _prompt_manager is not None:
+        _prompt_manager.clear_render_cache()
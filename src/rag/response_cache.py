@@ -0,0 +1,149 @@
+"""
+Response cache for finished RAG workflow runs
+"""
+
+import hashlib
+import threading
+import time
+import unicodedata
+import weakref
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Semantic lookups are optional; exact hits still work
+    np = None
+
+
+# Finished runs kept before the least recently used one is evicted
+RESPONSE_CACHE_SIZE = 1024
+
+# Seconds a cached run stays valid; web results go stale
+RESPONSE_CACHE_TTL = 600.0
+
+# Minimum cosine similarity for a near-identical query to reuse a cached run;
+# strict, since a paraphrase hit skips retrieval as well as generation
+SEMANTIC_CACHE_THRESHOLD = 0.97
+
+
+# Every live cache, so a knowledge base write can invalidate the runs that read it
+_caches: "weakref.WeakSet[ResponseCache]" = weakref.WeakSet()
+
+
+def invalidate_collection(collection_name: Optional[str]) -> None:
+    """Drop cached runs of a collection from every response cache"""
+    for cache in list(_caches):
+        cache.invalidate(collection_name)
+
+
+class ResponseCache:
+    """Two-level cache of finished runs: exact query hash, then nearest cached query embedding"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL,
+                 similarity_threshold: float = SEMANTIC_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        # key -> (stored_at, collection_name, state, unit query vector or None)
+        self._entries: "OrderedDict[bytes, Tuple[float, Optional[str], Any, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Stacked vectors of the semantic level, rebuilt lazily after any change
+        self._matrix = None
+        self._matrix_keys: List[bytes] = []
+        _caches.add(self)
+
+    @property
+    def semantic_enabled(self) -> bool:
+        """Whether nearest-neighbour lookups are available"""
+        return np is not None and self.similarity_threshold is not None
+
+    @staticmethod
+    def key(query: str, collection_name: Optional[str] = None) -> bytes:
+        """Exact-match key of a query against a collection, ignoring width, case and spacing"""
+        normalized = " ".join(unicodedata.normalize("NFKC", query).split()).casefold()
+        return hashlib.blake2b(f"{collection_name or ''}\0{normalized}".encode(), digest_size=16).digest()
+
+    def get(self, key: bytes) -> Optional[Any]:
+        """Cached state for an exact key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def nearest(self, vector: List[float], collection_name: Optional[str] = None) -> Optional[Any]:
+        """Cached state of the most similar earlier query on the same collection, or None"""
+        if not self.semantic_enabled:
+            return None
+        query_vector = self._unit(vector)
+
+        with self._lock:
+            if self._matrix is None:
+                self._rebuild_matrix()
+            if not self._matrix_keys:
+                return None
+
+            scores = self._matrix @ query_vector
+            now = time.monotonic()
+            # Best candidates first; stop at the first one that is still usable
+            for index in np.argsort(scores)[::-1]:
+                if scores[index] < self.similarity_threshold:
+                    return None
+                key = self._matrix_keys[index]
+                stored_at, cached_collection, state, _ = self._entries[key]
+                if cached_collection == collection_name and now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    return state
+            return None
+
+    def put(self, key: bytes, state: Any, collection_name: Optional[str] = None,
+            vector: Optional[List[float]] = None) -> None:
+        """Store a finished state, evicting the least recently used entry past capacity"""
+        unit_vector = self._unit(vector) if vector is not None and np is not None else None
+        with self._lock:
+            self._entries[key] = (time.monotonic(), collection_name, state, unit_vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def invalidate(self, collection_name: Optional[str]) -> None:
+        """Drop runs on a collection, and runs on the default collection (stored as None)"""
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[1] in (collection_name, None)]:
+                self._remove(key)
+
+    def clear(self) -> None:
+        """Drop every cached run"""
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+            self._matrix_keys = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: bytes) -> None:
+        """Delete one entry; caller holds the lock"""
+        del self._entries[key]
+        self._matrix = None
+
+    def _rebuild_matrix(self) -> None:
+        """Stack the vectors of all embedded entries; caller holds the lock"""
+        self._matrix_keys = [key for key, entry in self._entries.items() if entry[3] is not None]
+        if self._matrix_keys:
+            self._matrix = np.vstack([self._entries[key][3] for key in self._matrix_keys])
+        else:
+            self._matrix = np.empty((0, 0), dtype=np.float32)
+
+    @staticmethod
+    def _unit(vector: List[float]):
+        """Normalized float32 copy of a vector, so inner product is cosine similarity"""
+        array = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(array))
+        return array / norm if norm > 0 else array
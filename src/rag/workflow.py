@@ -2,64 +2,158 @@
 RAG workflow based on LangGraph
 """
 
+import logging
+import re
 import time
 import asyncio
+import sys
+import threading
 from typing import Dict, Any, List, Optional
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 from langchain_core.documents import Document
-from pydantic import BaseModel
+from langchain_core.runnables import RunnableConfig
+from pydantic import BaseModel, ConfigDict, Field
 
 from config.settings import get_model_config
+from src.knowledge_base.knowledge_base_manager import KnowledgeBaseManager
+from src.prompts.prompt_manager import get_prompt_manager
+from src.rag.response_cache import ResponseCache
+from src.search.web_search import search_web
+
+logger = logging.getLogger(__name__)
 
 
 class RAGState(BaseModel):
     """RAG workflow state"""
+    # Schema is built on first use rather than at import; instances that are
+    # already models (messages, documents) are passed through unvalidated
+    model_config = ConfigDict(
+        arbitrary_types_allowed=True,
+        defer_build=True,
+        revalidate_instances="never",
+        validate_assignment=False,
+    )
+    
     query: str
     collection_name: Optional[str] = None  # 新增：指定知识库名称
-    messages: List[BaseMessage] = []
-    documents: List[Document] = []
-    web_results: List[Dict[str, Any]] = []
+    messages: List[BaseMessage] = Field(default_factory=list)
+    documents: List[Document] = Field(default_factory=list)
+    web_results: List[Dict[str, Any]] = Field(default_factory=list)
     context: str = ""
+    # Per-origin parts of context, kept out of metadata so responses do not repeat them
+    knowledge_context: str = ""
+    web_context: str = ""
     response: str = ""
-    metadata: Dict[str, Any] = {}
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+    # Query embedding computed for the response cache, reused by knowledge retrieval
+    query_vector: Optional[List[float]] = Field(default=None, exclude=True)
+
+
+# Question words checked by analyze_query, matched anywhere in the query
+_QUESTION_KEYWORDS_RE = re.compile("what|how|why|when|什么|如何|怎么|为什么", re.IGNORECASE)
+
+
+# Section headers of the combined context string
+_KB_HEADER = "=== Knowledge Base Information ===\n"
+_WEB_HEADER = "=== Web Search Information ===\n"
+
+# Concurrent calls one workflow lets through to each backend, across all runs
+KNOWLEDGE_CONCURRENCY = 32
+WEB_SEARCH_CONCURRENCY = 16
+LLM_CONCURRENCY = 8
+
+# Streamed text is handed to the callback once this many characters are buffered,
+# or once this many seconds have passed since the last hand-off
+STREAM_FLUSH_CHARS = 64
+STREAM_FLUSH_INTERVAL = 0.02
+
+
+# Tasks that run their coroutine synchronously up to the first await (Python 3.12+)
+if sys.version_info >= (3, 12):
+    def _start_task(coro) -> asyncio.Task:
+        return asyncio.eager_task_factory(asyncio.get_running_loop(), coro)
+else:
+    _start_task = asyncio.ensure_future
+
+
+def _render_uncached(prompt_manager, name: str, **kwargs) -> str:
+    """Render through the compiled template directly; per-request contexts never repeat,
+    so going through the manager's render cache would only evict useful entries"""
+    prompt = prompt_manager.get_prompt(name)
+    if prompt is None:
+        raise ValueError(f"Prompt template not found: {name}")
+    return prompt.render(**kwargs)
+
+
+def _route_after_retrieval(state: RAGState) -> str:
+    """Skip fusion and context building when retrieval found nothing to fuse"""
+    return "fusion" if state.metadata.get("total_results", 0) else "fallback"
+
+
+def _instance_node(method_name: str):
+    """Graph node that calls the named method on the RAGWorkflow passed in the run config"""
+    async def node(state: RAGState, config: RunnableConfig) -> RAGState:
+        workflow = config["configurable"]["rag_workflow"]
+        return await getattr(workflow, method_name)(state)
     
-    class Config:
-        arbitrary_types_allowed = True
+    node.__name__ = method_name
+    return node
 
 
 class RAGWorkflow:
     """RAG workflow manager"""
     
+    # Compiled graph shared by every instance; nodes resolve the instance from the run config
+    _compiled_workflow = None
+    _compile_lock = threading.Lock()
+    
     def __init__(self):
         self.model_config = get_model_config()
         self.chat_model = self.model_config.get_chat_model()
         self.embedding_model = self.model_config.get_embedding_model()
         self.vector_store = self.model_config.get_vector_store()
+        self.response_cache = ResponseCache()
+        
+        # Backend limits, and one knowledge base manager per collection so its
+        # vector store and directories are set up once rather than per request
+        self._knowledge_limit = asyncio.Semaphore(KNOWLEDGE_CONCURRENCY)
+        self._web_limit = asyncio.Semaphore(WEB_SEARCH_CONCURRENCY)
+        self._llm_limit = asyncio.Semaphore(LLM_CONCURRENCY)
+        self._kb_managers: Dict[str, KnowledgeBaseManager] = {}
+        self._kb_managers_lock = threading.Lock()
         self.workflow = self._build_workflow()
     
-    def _build_workflow(self) -> StateGraph:
+    @classmethod
+    def _build_workflow(cls) -> StateGraph:
         """Build simplified LangGraph workflow - unified parallel retrieval"""
-        workflow = StateGraph(RAGState)
-        
-        # Add nodes - simplified version
-        workflow.add_node("query_analyzer", self.analyze_query)
-        workflow.add_node("parallel_retrieval", self.parallel_retrieval)
-        workflow.add_node("information_fusion", self.fuse_information)
-        workflow.add_node("context_builder", self.build_context)
-        workflow.add_node("response_generator", self.generate_response)
-        
-        # Set entry point
-        workflow.set_entry_point("query_analyzer")
-        
-        # Simplified linear flow
-        workflow.add_edge("query_analyzer", "parallel_retrieval")
-        workflow.add_edge("parallel_retrieval", "information_fusion")
-        workflow.add_edge("information_fusion", "context_builder")
-        workflow.add_edge("context_builder", "response_generator")
-        workflow.add_edge("response_generator", END)
-        
-        return workflow.compile()
+        with cls._compile_lock:
+            if cls._compiled_workflow is not None:
+                return cls._compiled_workflow
+            
+            workflow = StateGraph(RAGState)
+            
+            # Add nodes - simplified version
+            workflow.add_node("query_analyzer", _instance_node("analyze_query"))
+            workflow.add_node("parallel_retrieval", _instance_node("parallel_retrieval"))
+            workflow.add_node("information_fusion", _instance_node("fuse_and_build_context"))
+            workflow.add_node("response_generator", _instance_node("generate_response"))
+            
+            # Set entry point
+            workflow.set_entry_point("query_analyzer")
+            
+            # Simplified linear flow; empty retrievals go straight to the fallback response
+            workflow.add_edge("query_analyzer", "parallel_retrieval")
+            workflow.add_conditional_edges(
+                "parallel_retrieval",
+                _route_after_retrieval,
+                {"fusion": "information_fusion", "fallback": "response_generator"},
+            )
+            workflow.add_edge("information_fusion", "response_generator")
+            workflow.add_edge("response_generator", END)
+            
+            cls._compiled_workflow = workflow.compile()
+            return cls._compiled_workflow
     
     async def analyze_query(self, state: RAGState) -> RAGState:
         """Analyze query intent and characteristics"""
@@ -67,89 +161,100 @@ class RAGWorkflow:
         query = state.query
         
         # Basic query feature analysis
-        state.metadata.update({
-            "query_length": len(query),
-            "has_question_mark": "?" in query,
-            "has_keywords": any(kw in query.lower() for kw in ["what", "how", "why", "when", "什么", "如何", "怎么", "为什么"]),
-            "timestamp": time.time()
-        })
+        metadata = state.metadata
+        metadata["query_length"] = len(query)
+        metadata["has_question_mark"] = "?" in query or "？" in query
+        metadata["has_keywords"] = _QUESTION_KEYWORDS_RE.search(query) is not None
+        metadata["timestamp"] = time.time()
         
-        print(f"🔍 Query analysis: {query[:30]}{'...' if len(query) > 30 else ''}")
+        logger.debug("Query analysis: %s%s", query[:30], "..." if len(query) > 30 else "")
         return state
     
     async def parallel_retrieval(self, state: RAGState) -> RAGState:
         """Core parallel retrieval - execute knowledge base and web search simultaneously"""
-        import asyncio
-        
-        print("🔄 Parallel retrieval in progress...")
+        logger.debug("Parallel retrieval in progress")
         start_time = time.time()
         
-        # Create parallel tasks
-        knowledge_task = self._retrieve_knowledge_task(state)
-        web_task = self._search_web_task(state)
+        # Create parallel tasks, tagged so results can be handled in completion order;
+        # each starts eagerly and never raises, so one failure leaves the other running.
+        # Every task yields (origin, ok, results or error message)
+        tasks = [
+            _start_task(self._tagged("knowledge", self._retrieve_knowledge_task(state))),
+            _start_task(self._tagged("web", self._search_web_task(state))),
+        ]
         
         try:
-            # Execute in parallel, allow partial failures
-            knowledge_results, web_results = await asyncio.gather(
-                knowledge_task, 
-                web_task,
-                return_exceptions=True
-            )
-            
             # Count successful retrieval sources
             successful_sources = []
             total_results = 0
             
-            # Process knowledge base retrieval results
-            if isinstance(knowledge_results, Exception):
-                print(f"📚 Knowledge base: ❌ {str(knowledge_results)[:50]}...")
-                state.metadata["knowledge_error"] = str(knowledge_results)
-                state.metadata["knowledge_retrieved"] = 0
-            else:
-                state.documents.extend(knowledge_results)
-                kb_count = len(knowledge_results)
-                state.metadata["knowledge_retrieved"] = kb_count
-                total_results += kb_count
-                if kb_count > 0:
-                    successful_sources.append("Knowledge Base")
-                    print(f"📚 Knowledge base: ✅ {kb_count} documents")
+            # Handle each source as soon as it lands instead of waiting for the slower one
+            for next_done in asyncio.as_completed(tasks):
+                origin, ok, results = await next_done
+                
+                if origin == "knowledge":
+                    # Process knowledge base retrieval results
+                    if not ok:
+                        logger.warning("Knowledge base retrieval failed: %.50s", results)
+                        state.metadata["knowledge_error"] = results
+                        state.metadata["knowledge_retrieved"] = 0
+                    else:
+                        state.documents.extend(results)
+                        kb_count = len(results)
+                        state.metadata["knowledge_retrieved"] = kb_count
+                        total_results += kb_count
+                        if kb_count > 0:
+                            successful_sources.append("Knowledge Base")
+                            logger.debug("Knowledge base: %d documents", kb_count)
+                else:
+                    # Process web search results
+                    if not ok:
+                        logger.warning("Web search failed: %.50s", results)
+                        state.metadata["web_error"] = results
+                        state.metadata["web_retrieved"] = 0
+                    else:
+                        state.web_results.extend(results)
+                        web_count = len(results)
+                        state.metadata["web_retrieved"] = web_count
+                        total_results += web_count
+                        if web_count > 0:
+                            successful_sources.append("Web Search")
+                            logger.debug("Web search: %d results", web_count)
             
-            # Process web search results
-            if isinstance(web_results, Exception):
-                print(f"🌐 Web search: ❌ {str(web_results)[:50]}...")
-                state.metadata["web_error"] = str(web_results)
-                state.metadata["web_retrieved"] = 0
-            else:
-                state.web_results.extend(web_results)
-                web_count = len(web_results)
-                state.metadata["web_retrieved"] = web_count
-                total_results += web_count
-                if web_count > 0:
-                    successful_sources.append("Web Search")
-                    print(f"🌐 Web search: ✅ {web_count} results")
+            # Report sources in a fixed order regardless of which finished first
+            successful_sources = [s for s in ("Knowledge Base", "Web Search") if s in successful_sources]
             
             # Record retrieval statistics
             parallel_time = time.time() - start_time
-            state.metadata.update({
-                "parallel_retrieval_time": round(parallel_time, 2),
-                "total_results": total_results,
-                "successful_sources": successful_sources,
-                "retrieval_mode": self._determine_actual_mode(successful_sources)
-            })
+            metadata = state.metadata
+            metadata["parallel_retrieval_time"] = round(parallel_time, 2)
+            metadata["total_results"] = total_results
+            metadata["successful_sources"] = successful_sources
+            metadata["retrieval_mode"] = self._determine_actual_mode(successful_sources)
             
             # Output retrieval summary
             if successful_sources:
                 sources_str = " + ".join(successful_sources)
-                print(f"⚡ Retrieval completed: {sources_str} ({total_results} results, {parallel_time:.2f}s)")
+                logger.info("Retrieval completed: %s (%d results, %.2fs)", sources_str, total_results, parallel_time)
             else:
-                print(f"⚠️ Retrieval completed: No available results ({parallel_time:.2f}s)")
+                logger.warning("Retrieval completed: no available results (%.2fs)", parallel_time)
             
         except Exception as e:
+            for task in tasks:
+                task.cancel()
             state.metadata["parallel_error"] = str(e)
-            print(f"❌ Parallel retrieval system error: {e}")
+            logger.exception("Parallel retrieval system error: %s", e)
         
         return state
     
+    @staticmethod
+    async def _tagged(origin: str, coro) -> tuple:
+        """Await a retrieval coroutine, returning (origin, True, result) or (origin, False, error message)"""
+        try:
+            return origin, True, await coro
+        except Exception as e:
+            return origin, False, str(e)
+    
     def _determine_actual_mode(self, successful_sources: list) -> str:
         """Determine execution mode based on actual retrieval results"""
         if not successful_sources:
@@ -164,42 +269,32 @@ class RAGWorkflow:
             return "Unknown Mode"
     
     async def _retrieve_knowledge_task(self, state: RAGState) -> List:
-        """Knowledge base retrieval task - for parallel execution"""
-        try:
-            # 直接创建知识库管理器实例，而不是使用全局单例
-            from src.knowledge_base.knowledge_base_manager import KnowledgeBaseManager
-            
-            # 确定要使用的知识库名称
-            collection_name = state.collection_name or "knowledge_base"  # 默认知识库
-            print(f"📚 Using knowledge base: {collection_name}")
-            
-            # 直接创建指定知识库的管理器实例
-            kb_manager = KnowledgeBaseManager(collection_name=collection_name)
-            result = await kb_manager.search(state.query, k=3, include_scores=False)
-            
-            if result.get("success"):
-                # Convert to Document objects
-                docs = []
-                for item in result.get("results", []):
-                    from langchain_core.documents import Document
-                    doc = Document(
-                        page_content=item["content"], 
-                        metadata=item["metadata"]
-                    )
-                    docs.append(doc)
-                return docs
-            else:
-                raise Exception(result.get("message", "Knowledge base search failed"))
-                    
-        except Exception as e:
-            # Raise exception for parallel processor to catch
-            raise e
+        """Knowledge base retrieval task - for parallel execution; failures propagate to _tagged"""
+        # 确定要使用的知识库名称
+        collection_name = state.collection_name or "knowledge_base"  # 默认知识库
+        logger.debug("Using knowledge base: %s", collection_name)
+        
+        # 使用指定知识库的管理器实例（按集合复用），而不是使用全局单例
+        kb_manager = self._get_kb_manager(collection_name)
+        # Documents come straight from the vector store, without a round trip
+        # through result dicts and a second round of Document construction
+        async with self._knowledge_limit:
+            return await kb_manager.search_documents(state.query, k=3, query_vector=state.query_vector)
+    
+    def _get_kb_manager(self, collection_name: str) -> KnowledgeBaseManager:
+        """Knowledge base manager for a collection, created on first use"""
+        kb_manager = self._kb_managers.get(collection_name)
+        if kb_manager is None:
+            with self._kb_managers_lock:
+                kb_manager = self._kb_managers.get(collection_name)
+                if kb_manager is None:
+                    kb_manager = KnowledgeBaseManager(collection_name=collection_name)
+                    self._kb_managers[collection_name] = kb_manager
+        return kb_manager
     
     async def _search_web_task(self, state: RAGState) -> List:
-        """Web search task - for parallel execution"""
-        try:
-            from src.search.web_search import search_web
-            
+        """Web search task - for parallel execution; failures propagate to _tagged"""
+        async with self._web_limit:
             web_results = await search_web(
                 query=state.query,
                 max_results=5,  # Limit to 5 results
@@ -208,113 +303,69 @@ class RAGWorkflow:
                     "exclude_domains": ["google.com", "bing.com"]
                 }
             )
-            
-            return web_results if web_results else []
-        except Exception as e:
-            # Raise exception for parallel processor to catch
-            raise e
-    
-    async def fuse_information(self, state: RAGState) -> RAGState:
-        """Fuse information"""
-        # Merge knowledge base documents and web search results
-        all_sources = []
-        
-        # Add knowledge base documents
-        for doc in state.documents:
-            all_sources.append({
-                "content": doc.page_content,
-                "source": "knowledge_base",
-                "metadata": doc.metadata
-            })
-        
-        # Add web search results
-        for result in state.web_results:
-            all_sources.append({
-                "content": result["content"],
-                "source": "web_search",
-                "metadata": {"url": result["url"], "title": result["title"]}
-            })
         
-        state.metadata["total_sources"] = len(all_sources)
-        state.metadata["fused_sources"] = all_sources
-        
-        return state
+        return web_results if web_results else []
     
-    async def build_context(self, state: RAGState) -> RAGState:
-        """Build context"""
-        sources = state.metadata.get("fused_sources", [])
-        
-        # Build knowledge base and web search contexts separately
-        knowledge_sources = [s for s in sources if s['source'] == 'knowledge_base']
-        web_sources = [s for s in sources if s['source'] == 'web_search']
-        
-        # Build knowledge base context
-        knowledge_context = ""
-        if knowledge_sources:
-            kb_parts = []
-            for i, source in enumerate(knowledge_sources[:3]):
-                metadata = source.get('metadata', {})
-                source_info = f"Document: {metadata.get('filename', 'Unknown')}"
-                kb_parts.append(f"{source_info}\nContent: {source['content'][:500]}")
-            knowledge_context = "\n\n".join(kb_parts)
-        
-        # Build web search context  
-        web_context = ""
-        if web_sources:
-            web_parts = []
-            for i, source in enumerate(web_sources[:3]):
-                metadata = source.get('metadata', {})
-                source_info = f"Title: {metadata.get('title', 'Unknown')}\nLink: {metadata.get('url', 'Unknown')}"
-                web_parts.append(f"{source_info}\nContent: {source['content'][:500]}")
-            web_context = "\n\n".join(web_parts)
+    async def fuse_and_build_context(self, state: RAGState) -> RAGState:
+        """Fuse retrieved information and build the context in one pass over the sources"""
+        # Only the first three sources of each origin reach the context, so the
+        # documents and web results are read directly instead of copied first
+        knowledge_context = "\n\n".join(
+            f"Document: {doc.metadata.get('filename', 'Unknown')}\nContent: {doc.page_content[:500]}"
+            for doc in state.documents[:3]
+        )
+        web_context = "\n\n".join(
+            f"Title: {result['title']}\nLink: {result['url']}\nContent: {result['content'][:500]}"
+            for result in state.web_results[:3]
+        )
         
         # Save structured context
-        state.metadata["knowledge_context"] = knowledge_context
-        state.metadata["web_context"] = web_context
+        state.metadata["total_sources"] = len(state.documents) + len(state.web_results)
+        state.knowledge_context = knowledge_context
+        state.web_context = web_context
         
-        # Build complete context (backward compatibility)
-        all_parts = []
-        if knowledge_context:
-            all_parts.append(f"=== Knowledge Base Information ===\n{knowledge_context}")
-        if web_context:
-            all_parts.append(f"=== Web Search Information ===\n{web_context}")
-        
-        state.context = "\n\n".join(all_parts)
+        # Build complete context (backward compatibility) without a second join
+        if knowledge_context and web_context:
+            state.context = f"{_KB_HEADER}{knowledge_context}\n\n{_WEB_HEADER}{web_context}"
+        elif knowledge_context:
+            state.context = f"{_KB_HEADER}{knowledge_context}"
+        elif web_context:
+            state.context = f"{_WEB_HEADER}{web_context}"
+        else:
+            state.context = ""
         return state
     
     async def generate_response(self, state: RAGState, stream_callback=None) -> RAGState:
         """Intelligent response generation - select prompt based on actual retrieval results"""
         try:
-            from src.prompts.prompt_manager import render_prompt, get_prompt_manager
-            
             # Get prompt manager and detect language
             prompt_manager = get_prompt_manager()
             
             # Select prompt strategy based on actual retrieval mode
             retrieval_mode = state.metadata.get("retrieval_mode", "Hybrid Mode") 
-            knowledge_context = state.metadata.get("knowledge_context", "")
-            web_context = state.metadata.get("web_context", "")
+            knowledge_context = state.knowledge_context
+            web_context = state.web_context
             
             # Smart prompt selection (language adaptive)
             if retrieval_mode == "Knowledge Base Mode" and knowledge_context:
                 # Knowledge base mode maintains original logic for now
-                prompt = render_prompt("knowledge_only", 
-                                     knowledge_context=knowledge_context,
-                                     query=state.query)
+                prompt = _render_uncached(prompt_manager, "knowledge_only",
+                                          knowledge_context=knowledge_context,
+                                          query=state.query)
                 prompt_type = "knowledge_only"
             elif retrieval_mode == "Web Mode" and web_context:
                 # Web mode maintains original logic for now  
-                prompt = render_prompt("web_only",
-                                     web_context=web_context, 
-                                     query=state.query)
+                prompt = _render_uncached(prompt_manager, "web_only",
+                                          web_context=web_context, 
+                                          query=state.query)
                 prompt_type = "web_only"
             elif retrieval_mode == "Hybrid Mode":
                 # Use language-adaptive RAG prompt
                 adaptive_template = prompt_manager.select_adaptive_prompt(state.query)
-                prompt = render_prompt(adaptive_template,
-                                     knowledge_context=knowledge_context or "No relevant knowledge base information available",
-                                     web_context=web_context or "No relevant web search information available", 
-                                     query=state.query)
+                prompt = _render_uncached(prompt_manager, adaptive_template,
+                                          knowledge_context=knowledge_context or "No relevant knowledge base information available",
+                                          web_context=web_context or "No relevant web search information available", 
+                                          query=state.query)
                 prompt_type = adaptive_template
             else:
                 # Response without retrieval results
@@ -332,47 +383,135 @@ Answer:"""
             
             if stream_callback:
                 # Streaming output mode
-                full_response = ""
-                async for chunk in self.chat_model.astream(messages):
-                    if hasattr(chunk, 'content') and chunk.content:
-                        full_response += chunk.content
-                        if stream_callback:
-                            if asyncio.iscoroutinefunction(stream_callback):
-                                await stream_callback(chunk.content)
+                # Coalesce token-sized chunks so the callback runs once per batch;
+                # the callback kind and clock are resolved once, not per chunk
+                parts = []
+                pending = []
+                pending_chars = 0
+                callback_is_async = asyncio.iscoroutinefunction(stream_callback)
+                monotonic = time.monotonic
+                last_flush = monotonic()
+                async with self._llm_limit:
+                    async for chunk in self.chat_model.astream(messages):
+                        content = getattr(chunk, 'content', None)
+                        if not content:
+                            continue
+                        parts.append(content)
+                        pending.append(content)
+                        pending_chars += len(content)
+                        now = monotonic()
+                        if pending_chars >= STREAM_FLUSH_CHARS or now - last_flush >= STREAM_FLUSH_INTERVAL:
+                            text = "".join(pending)
+                            if callback_is_async:
+                                await stream_callback(text)
                             else:
-                                stream_callback("chunk", chunk.content)
+                                stream_callback("chunk", text)
+                            pending.clear()
+                            pending_chars = 0
+                            last_flush = now
+                if pending:
+                    await self._send_chunk(stream_callback, "".join(pending))
                 
-                state.response = full_response
+                state.response = "".join(parts)
             else:
                 # Non-streaming output mode
-                response = await self.chat_model.ainvoke(messages)
+                async with self._llm_limit:
+                    response = await self.chat_model.ainvoke(messages)
                 state.response = response.content
             
             state.messages.append(HumanMessage(content=state.query))
             state.messages.append(AIMessage(content=state.response))
             
             # Record generation information
-            state.metadata.update({
-                "prompt_type_used": prompt_type,
-                "response_length": len(state.response),
-                "generation_successful": True
-            })
+            metadata = state.metadata
+            metadata["prompt_type_used"] = prompt_type
+            metadata["response_length"] = len(state.response)
+            metadata["generation_successful"] = True
             
-            print(f"💬 Response generated: {prompt_type} ({len(state.response)} characters)")
+            logger.info("Response generated: %s (%d characters)", prompt_type, len(state.response))
             
         except Exception as e:
             state.response = f"Sorry, an error occurred while generating the response: {str(e)}"
-            state.metadata.update({
-                "generation_error": str(e),
-                "generation_successful": False
-            })
-            print(f"❌ Response generation failed: {e}")
+            state.metadata["generation_error"] = str(e)
+            state.metadata["generation_successful"] = False
+            logger.exception("Response generation failed: %s", e)
         
         return state
     
+    @staticmethod
+    async def _send_chunk(stream_callback, content: str) -> None:
+        """Pass generated text to a streaming callback, async or sync"""
+        if asyncio.iscoroutinefunction(stream_callback):
+            await stream_callback(content)
+        else:
+            stream_callback("chunk", content)
+    
+    async def _embed_query(self, query: str) -> Optional[List[float]]:
+        """Embed the query for semantic cache lookups; None when embedding is unavailable"""
+        try:
+            return await self.embedding_model.aembed_query(query)
+        except Exception as e:
+            logger.debug("Query embedding for response cache failed: %s", e)
+            return None
+    
+    async def _lookup_cache(self, cache_key: bytes, query: str,
+                            collection_name: Optional[str]) -> tuple:
+        """Return (cached state or None, hit level, query vector or None)"""
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            return cached, "exact", None
+        
+        if not self.response_cache.semantic_enabled:
+            return None, None, None
+        query_vector = await self._embed_query(query)
+        if query_vector is None:
+            return None, None, None
+        try:
+            cached = self.response_cache.nearest(query_vector, collection_name)
+        except Exception as e:
+            logger.debug("Semantic response cache lookup failed: %s", e)
+            cached = None
+        return cached, "semantic" if cached is not None else None, query_vector
+    
+    def _store_in_cache(self, cache_key: bytes, final_state, collection_name: Optional[str],
+                        query_vector: Optional[List[float]]) -> None:
+        """Keep a detached copy of a successful run for later identical or similar queries"""
+        state = RAGState(**final_state) if isinstance(final_state, dict) else final_state
+        metadata = state.metadata
+        # An empty retrieval is not worth replaying: the next upload may answer it
+        if not metadata.get("generation_successful") or metadata.get("retrieval_mode") == "No Results":
+            return
+        self.response_cache.put(cache_key, state.model_copy(deep=True), collection_name, query_vector)
+    
+    @staticmethod
+    def _from_cache(cached: RAGState, query: str, hit_level: str) -> RAGState:
+        """Fresh state for the caller built from a cached run"""
+        metadata = dict(cached.metadata)
+        metadata["timestamp"] = time.time()
+        metadata["cache_hit"] = hit_level
+        return cached.model_copy(update={
+            "query": query,
+            "messages": list(cached.messages),
+            "documents": list(cached.documents),
+            "web_results": list(cached.web_results),
+            "metadata": metadata,
+        })
+    
     async def run(self, query: str, collection_name: Optional[str] = None, stream_callback=None) -> RAGState:
         """Run RAG workflow"""
-        initial_state = RAGState(query=query, collection_name=collection_name)
+        # Repeated or near-identical queries reuse an earlier finished run
+        cache_key = ResponseCache.key(query, collection_name)
+        cached, hit_level, query_vector = await self._lookup_cache(cache_key, query, collection_name)
+        if cached is not None:
+            logger.info("Response cache hit (%s): %s", hit_level, query[:30])
+            state = self._from_cache(cached, query, hit_level)
+            if stream_callback:
+                if callable(stream_callback):
+                    stream_callback("generation")
+                await self._send_chunk(stream_callback, state.response)
+            return state
+        
+        initial_state = RAGState(query=query, collection_name=collection_name, query_vector=query_vector)
         
         # Since LangGraph doesn't directly support streaming callbacks, we need to manually execute steps
         if stream_callback:
@@ -385,23 +524,45 @@ Answer:"""
                 stream_callback("retrieval")
             state = await self.parallel_retrieval(state)
             
-            if callable(stream_callback):
-                stream_callback("fusion")
-            state = await self.fuse_information(state)
-            
-            if callable(stream_callback):
-                stream_callback("context")
-            state = await self.build_context(state)
+            if _route_after_retrieval(state) == "fusion":
+                # Fusion and context building are one step; both progress stages are still reported
+                if callable(stream_callback):
+                    stream_callback("fusion")
+                    stream_callback("context")
+                state = await self.fuse_and_build_context(state)
             
             if callable(stream_callback):
                 stream_callback("generation")
             state = await self.generate_response(state, stream_callback)
+            self._store_in_cache(cache_key, state, collection_name, query_vector)
             return state
         else:
             # Use standard workflow
-            final_state = await self.workflow.ainvoke(initial_state)
+            final_state = await self.workflow.ainvoke(
+                initial_state, config={"configurable": {"rag_workflow": self}}
+            )
+            self._store_in_cache(cache_key, final_state, collection_name, query_vector)
             return final_state
 
 
-# Create global workflow instance
-rag_workflow = RAGWorkflow()
\ No newline at end of file
+# Global workflow instance, created on first use so importing this module
+# does not load models or compile the graph
+_rag_workflow: Optional[RAGWorkflow] = None
+_rag_workflow_lock = threading.Lock()
+
+
+def get_rag_workflow() -> RAGWorkflow:
+    """Get RAG workflow instance"""
+    global _rag_workflow
+    if _rag_workflow is None:
+        with _rag_workflow_lock:
+            if _rag_workflow is None:
+                _rag_workflow = RAGWorkflow()
+    return _rag_workflow
+
+
+def __getattr__(name: str):
+    # Backward compatibility for `from src.rag.workflow import rag_workflow`
+    if name == "rag_workflow":
+        return get_rag_workflow()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
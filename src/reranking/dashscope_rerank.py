@@ -2,14 +2,75 @@
 DashScope Reranking Model Implementation
 """
 
+import aiohttp
+import asyncio
 import dashscope
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
 from http import HTTPStatus
 from typing import List, Dict, Any, Optional, Tuple
 import os
 import logging
 
+from src.utils.http_utils import get_http_session
+
 logger = logging.getLogger(__name__)
 
+# REST path of the text rerank service, relative to dashscope.base_http_api_url
+RERANK_PATH = "/services/rerank/text-rerank/text-rerank"
+
+# Seconds allowed for one async rerank request
+RERANK_TIMEOUT = 30
+
+# Successful rerank results memoized per (model, query, documents, top_n)
+RERANK_CACHE_SIZE = 1024
+
+_rerank_cache: "OrderedDict[bytes, List[Dict[str, Any]]]" = OrderedDict()
+_rerank_cache_lock = threading.Lock()
+
+
+def _rerank_key(model: str, query: str, documents: List[str], top_n: int, return_documents: bool) -> bytes:
+    """Digest identifying one rerank request; documents are hashed individually"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{model}\0{top_n}\0{int(return_documents)}\0{query}".encode())
+    for doc in documents:
+        digest.update(b"\0")
+        digest.update(hashlib.blake2b(doc.encode(), digest_size=16).digest())
+    return digest.digest()
+
+
+def _get_cached(key: bytes) -> Optional[List[Dict[str, Any]]]:
+    """Copy of a memoized rerank result, or None"""
+    with _rerank_cache_lock:
+        results = _rerank_cache.get(key)
+        if results is None:
+            return None
+        _rerank_cache.move_to_end(key)
+    return [dict(result) for result in results]
+
+
+def _put_cached(key: bytes, results: List[Dict[str, Any]]) -> None:
+    """Memoize a rerank result, evicting the least recently used"""
+    with _rerank_cache_lock:
+        _rerank_cache[key] = [dict(result) for result in results]
+        _rerank_cache.move_to_end(key)
+        if len(_rerank_cache) > RERANK_CACHE_SIZE:
+            _rerank_cache.popitem(last=False)
+
+
+def _fallback_results(documents: List[str], top_n: int) -> List[Dict[str, Any]]:
+    """Original documents in original order, used when reranking fails"""
+    return [
+        {
+            "index": i,
+            "document": doc,
+            "relevance_score": 1.0 - (i * 0.1)  # Simple descending scores
+        }
+        for i, doc in enumerate(documents[:top_n])
+    ]
+
 
 class DashScopeRerank:
     """DashScope reranking model wrapper class"""
@@ -34,6 +95,11 @@ class DashScopeRerank:
         self.model = model
         self.top_n = top_n
         self.return_documents = return_documents
+        # Requests in flight keyed like the result cache; identical concurrent calls share one.
+        # Futures belong to the loop that created them, so each loop has its own map
+        self._inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[bytes, asyncio.Future]]" = (
+            weakref.WeakKeyDictionary()
+        )
         
         # Set API key
         if api_key:
@@ -62,6 +128,11 @@ class DashScopeRerank:
         """
         if top_n is None:
             top_n = self.top_n
+        
+        key = _rerank_key(self.model, query, documents, top_n, self.return_documents)
+        cached = _get_cached(key)
+        if cached is not None:
+            return cached
             
         try:
             resp = dashscope.TextReRank.call(
@@ -88,30 +159,17 @@ class DashScopeRerank:
                     results.append(result)
                 
                 logger.info(f"Successfully reranked {len(results)} documents")
+                _put_cached(key, results)
                 return results
             else:
                 logger.error(f"DashScope rerank failed: {resp.code} - {resp.message}")
                 # If reranking fails, return original documents (in original order)
-                return [
-                    {
-                        "index": i,
-                        "document": doc,
-                        "relevance_score": 1.0 - (i * 0.1)  # Simple descending scores
-                    }
-                    for i, doc in enumerate(documents[:top_n])
-                ]
+                return _fallback_results(documents, top_n)
                 
         except Exception as e:
             logger.error(f"DashScope rerank error: {str(e)}")
             # Return original documents on error
-            return [
-                {
-                    "index": i,
-                    "document": doc,
-                    "relevance_score": 1.0 - (i * 0.1)
-                }
-                for i, doc in enumerate(documents[:top_n])
-            ]
+            return _fallback_results(documents, top_n)
     
     def rerank_documents_with_metadata(
         self,
@@ -140,16 +198,19 @@ class DashScopeRerank:
         
         # Perform reranking
         rerank_results = self.rerank(query, doc_contents, top_n)
-        
-        # Merge results with original document metadata
-        final_results = []
-        for result in rerank_results:
-            original_doc = documents[result["index"]].copy()
-            original_doc["relevance_score"] = result["relevance_score"]
-            original_doc["rerank_index"] = result["index"]
-            final_results.append(original_doc)
-        
-        return final_results
+        return self._merge_with_metadata(documents, rerank_results)
+    
+    @staticmethod
+    def _merge_with_metadata(documents: List[Dict[str, Any]],
+                             rerank_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Merge rerank results with original document metadata"""
+        # One dict display per result instead of copy() plus two item assignments
+        return [
+            {**documents[result["index"]],
+             "relevance_score": result["relevance_score"],
+             "rerank_index": result["index"]}
+            for result in rerank_results
+        ]
     
     async def arerank(
         self, 
@@ -159,9 +220,74 @@ class DashScopeRerank:
     ) -> List[Dict[str, Any]]:
         """
         Asynchronous version of reranking method
-        Note: DashScope Python SDK currently does not support async calls, using sync method here
+        Note: DashScope Python SDK has no async API, so the REST endpoint is called
+        directly over the shared aiohttp session; results match rerank()
         """
-        return self.rerank(query, documents, top_n)
+        if top_n is None:
+            top_n = self.top_n
+        
+        key = _rerank_key(self.model, query, documents, top_n, self.return_documents)
+        cached = _get_cached(key)
+        if cached is not None:
+            return cached
+        
+        inflight = self._inflight.setdefault(asyncio.get_running_loop(), {})
+        request = inflight.get(key)
+        if request is None:
+            request = asyncio.ensure_future(self._request_rerank(key, query, documents, top_n))
+            inflight[key] = request
+            request.add_done_callback(lambda _: inflight.pop(key, None))
+        # Shielded so one caller's cancellation does not fail the others
+        results = await asyncio.shield(request)
+        return [dict(result) for result in results]
+    
+    async def _request_rerank(
+        self,
+        key: bytes,
+        query: str,
+        documents: List[str],
+        top_n: int
+    ) -> List[Dict[str, Any]]:
+        """POST one rerank request; never raises, falling back to the original order"""
+        payload = {
+            "model": self.model,
+            "input": {"query": query, "documents": documents},
+            "parameters": {
+                "top_n": min(top_n, len(documents)),
+                "return_documents": self.return_documents
+            }
+        }
+        
+        try:
+            session = await get_http_session()
+            async with session.post(
+                dashscope.base_http_api_url.rstrip("/") + RERANK_PATH,
+                json=payload,
+                headers={"Authorization": f"Bearer {dashscope.api_key}"},
+                timeout=aiohttp.ClientTimeout(total=RERANK_TIMEOUT)
+            ) as response:
+                data = await response.json(content_type=None)
+                if response.status != HTTPStatus.OK:
+                    logger.error("DashScope rerank failed: %s - %s", data.get("code"), data.get("message"))
+                    return _fallback_results(documents, top_n)
+            
+            results = []
+            for item in data["output"]["results"]:
+                index = item["index"]
+                document = item.get("document") if self.return_documents else None
+                results.append({
+                    "index": index,
+                    "relevance_score": item["relevance_score"],
+                    "document": document["text"] if document else documents[index]
+                })
+            
+            logger.info("Successfully reranked %d documents", len(results))
+            _put_cached(key, results)
+            return results
+        
+        except Exception as e:
+            logger.error("DashScope rerank error: %s", e)
+            return _fallback_results(documents, top_n)
     
     async def arerank_documents_with_metadata(
         self,
@@ -173,7 +299,12 @@ class DashScopeRerank:
         """
         Asynchronous version of document reranking with metadata method
         """
-        return self.rerank_documents_with_metadata(query, documents, content_key, top_n)
+        if not documents:
+            return []
+        
+        doc_contents = [doc.get(content_key, "") for doc in documents]
+        rerank_results = await self.arerank(query, doc_contents, top_n)
+        return self._merge_with_metadata(documents, rerank_results)
 
 
 def create_dashscope_reranker(config: Dict[str, Any]) -> DashScopeRerank:
@@ -3,12 +3,15 @@ Web Search Module - Supporting Multiple Search Engines
 """
 
 import asyncio
-import aiohttp
+import logging
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import json
 
 from config.settings import get_settings
+from src.utils.http_utils import get_http_session, close_http_session
+
+logger = logging.getLogger(__name__)
 
 
 class WebSearchResult:
@@ -42,13 +45,10 @@ class TavilySearchEngine:
     def __init__(self, api_key: str):
         self.api_key = api_key
         self.base_url = "https://api.tavily.com"
-        self.session = None
     
     async def _get_session(self):
-        """Get or create HTTP session"""
-        if self.session is None:
-            self.session = aiohttp.ClientSession()
-        return self.session
+        """Get the process-wide pooled HTTP session"""
+        return await get_http_session()
     
     async def search(self, query: str, max_results: int = 5, 
                     search_depth: str = "basic", 
@@ -90,7 +90,7 @@ class TavilySearchEngine:
                 return self._parse_tavily_results(data)
                 
         except Exception as e:
-            print(f"❌ Tavily search failed: {e}")
+            logger.warning("Tavily search failed: %s", e)
             return []
     
     def _parse_tavily_results(self, data: Dict[str, Any]) -> List[WebSearchResult]:
@@ -111,23 +111,13 @@ class TavilySearchEngine:
         
         return results
     
-    async def close(self):
-        """Close HTTP session"""
-        if self.session:
-            await self.session.close()
-            self.session = None
 
 
 class DuckDuckGoSearchEngine:
     """DuckDuckGo search engine (backup)"""
     
-    def __init__(self):
-        self.session = None
-    
     async def _get_session(self):
-        if self.session is None:
-            self.session = aiohttp.ClientSession()
-        return self.session
+        return await get_http_session()
     
     async def search(self, query: str, max_results: int = 5) -> List[WebSearchResult]:
         """Execute DuckDuckGo search (simplified version)"""
@@ -145,11 +135,6 @@ class DuckDuckGoSearchEngine:
         ]
         
         return results
-    
-    async def close(self):
-        if self.session:
-            await self.session.close()
-            self.session = None
 
 
 class WebSearchManager:
@@ -185,24 +170,24 @@ class WebSearchManager:
                 )
                 
                 if results:
-                    print(f"✅ Tavily search successful: found {len(results)} results")
+                    logger.debug("Tavily search successful: found %d results", len(results))
                     return results
                     
             except Exception as e:
-                print(f"⚠️ Tavily search failed, trying backup: {e}")
+                logger.warning("Tavily search failed, trying backup: %s", e)
         
         # Backup: DuckDuckGo
         if self.duckduckgo_engine:
             try:
                 results = await self.duckduckgo_engine.search(query, max_results)
-                print(f"✅ DuckDuckGo search successful: found {len(results)} results")
+                logger.debug("DuckDuckGo search successful: found %d results", len(results))
                 return results
                 
             except Exception as e:
-                print(f"❌ DuckDuckGo search also failed: {e}")
+                logger.warning("DuckDuckGo search also failed: %s", e)
         
         # Return empty results
-        print("❌ All search engines unavailable")
+        logger.warning("All search engines unavailable")
         return []
     
     def get_search_summary(self, results: List[WebSearchResult]) -> Dict[str, Any]:
@@ -223,11 +208,8 @@ class WebSearchManager:
         }
     
     async def close(self):
-        """Close all search engine connections"""
-        if self.tavily_engine:
-            await self.tavily_engine.close()
-        if self.duckduckgo_engine:
-            await self.duckduckgo_engine.close()
+        """Close all search engine connections (the shared HTTP session)"""
+        await close_http_session()
 
 
 # Global search manager instance
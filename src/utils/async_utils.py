@@ -168,6 +168,12 @@ async def run_in_thread_pool(func: Callable, *args, **kwargs) -> Any:
     return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
 
 
+async def run_in_executor(executor: Optional[concurrent.futures.Executor], func: Callable, *args, **kwargs) -> Any:
+    """Run sync function in the given executor (default thread pool if None)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
 def is_async_context() -> bool:
     """Check if currently in async context"""
     try:
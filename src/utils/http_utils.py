@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+HTTP utility functions - One pooled client session per event loop, shared by outbound API calls
+"""
+
+import asyncio
+import weakref
+
+import aiohttp
+
+
+# Open connections kept by the shared pool, overall and per host
+HTTP_POOL_LIMIT = 100
+HTTP_POOL_LIMIT_PER_HOST = 32
+
+# Seconds resolved host addresses are reused
+HTTP_DNS_CACHE_TTL = 300
+
+
+# A session cannot cross event loops, so each loop keeps its own; entries go with their loop
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """Shared session for the running loop, created on first use"""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=HTTP_POOL_LIMIT,
+                limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+                ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+            )
+        )
+        _sessions[loop] = session
+    return session
+
+
+async def close_http_session():
+    """Close the running loop's shared session (for cleanup when application shuts down)"""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
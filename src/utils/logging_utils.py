@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Logging utility functions - Non-blocking log output for async services
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+from typing import Optional
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_queue_logging() -> logging.handlers.QueueListener:
+    """Move root log handlers behind a queue so emitting a record never blocks on stream I/O"""
+    global _listener
+    if _listener is not None:
+        return _listener
+    
+    root = logging.getLogger()
+    handlers = root.handlers[:] or [logging.StreamHandler()]
+    for handler in handlers:
+        root.removeHandler(handler)
+    
+    # Callers only enqueue; a background thread does the formatting and writes
+    log_queue = queue.SimpleQueue()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+Time utility functions - Cheap wall-clock timestamps for hot paths
+"""
+
+import time
+from datetime import datetime
+
+
+# (epoch second, ISO string) pair; replaced as one object so readers never see a torn pair
+_iso_cache = (0, "")
+
+
+def now_iso() -> str:
+    """Current local time in ISO format, cached with 1-second granularity"""
+    global _iso_cache
+    second = int(time.time())
+    cached = _iso_cache
+    if cached[0] != second:
+        cached = (second, datetime.fromtimestamp(second).isoformat())
+        _iso_cache = cached
+    return cached[1]
@@ -0,0 +1,59 @@
+"""
+HTTP嵌入服务客户端单元测试
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from src.embeddings.http_embeddings import HTTPEmbeddings
+
+
+def _handler(request: httpx.Request) -> httpx.Response:
+    """模拟OpenAI兼容的 /embeddings 接口（乱序返回）"""
+    body = json.loads(request.content)
+    data = [
+        {"index": i, "embedding": [float(len(text)), 1.0]}
+        for i, text in enumerate(body["input"])
+    ]
+    return httpx.Response(200, json={"data": list(reversed(data))})
+
+
+class TestHTTPEmbeddings:
+    """HTTPEmbeddings测试"""
+
+    @pytest.fixture
+    def embedder(self):
+        embedder = HTTPEmbeddings(base_url="http://embedder/", batch_size=2)
+        embedder._client = httpx.Client(transport=httpx.MockTransport(_handler))
+        embedder._new_async_client = lambda: httpx.AsyncClient(transport=httpx.MockTransport(_handler))
+        return embedder
+
+    def test_url(self, embedder):
+        """测试接口地址拼接"""
+        assert embedder.url == "http://embedder/embeddings"
+
+    def test_embed_documents_keeps_order(self, embedder):
+        """测试分批请求后保持输入顺序"""
+        vectors = embedder.embed_documents(["a", "bb", "ccc"])
+        assert [v[0] for v in vectors] == [1.0, 2.0, 3.0]
+        assert embedder.embed_query("dddd") == [4.0, 1.0]
+
+    @pytest.mark.asyncio
+    async def test_aembed_documents_keeps_order(self, embedder):
+        """测试并发请求后保持输入顺序"""
+        vectors = await embedder.aembed_documents(["a", "bb", "ccc", "dddd", "eeeee"])
+        assert [v[0] for v in vectors] == [1.0, 2.0, 3.0, 4.0, 5.0]
+        await embedder.aclose()
+
+    def test_aembed_across_event_loops(self, embedder):
+        """测试在不同事件循环中复用同一个嵌入器"""
+        assert asyncio.run(embedder.aembed_query("a")) == [1.0, 1.0]
+        assert asyncio.run(embedder.aembed_query("bb")) == [2.0, 1.0]
+
+    def test_unknown_setting_rejected(self):
+        """测试拼写错误的配置项直接报错"""
+        with pytest.raises(TypeError):
+            HTTPEmbeddings(base_ur1="http://embedder")
@@ -0,0 +1,278 @@
+"""
+提示词管理模块单元测试
+"""
+
+import json
+
+import pytest
+import yaml
+
+from src.prompts.prompt_manager import PromptManager, PromptTemplate, _BUILTIN_SPECS, _YAML_CACHE
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """使用临时目录的提示词管理器"""
+    return PromptManager(prompts_dir=str(tmp_path))
+
+
+class TestPromptTemplate:
+    """PromptTemplate测试"""
+
+    def test_render_matches_str_format(self, manager):
+        """测试预编译渲染结果与str.format一致"""
+        kwargs = {"knowledge_context": "K {x}", "web_context": "W", "query": "Q", "text": "T",
+                  "knowledge_info": "KI", "web_info": "WI"}
+        for name in _BUILTIN_SPECS:
+            prompt = manager.get_prompt(name)
+            assert prompt.render(**kwargs) == prompt.template.format(**kwargs)
+
+    def test_render_format_spec_and_conversion(self):
+        """测试格式说明符与转换标记"""
+        prompt = PromptTemplate(name="t", version="1", description="", template="{a!r}|{b:>4}|{{c}}",
+                                variables=["a", "b"])
+        assert prompt.render(a="x", b=7) == "'x'|   7|{c}"
+
+    def test_render_fallback_for_complex_fields(self):
+        """测试复杂字段回退到str.format"""
+        prompt = PromptTemplate(name="t", version="1", description="", template="{d[k]}-{n:{w}}",
+                                variables=["d", "n", "w"])
+        assert prompt.render(d={"k": "v"}, n=1, w=3) == "v-  1"
+
+    def test_render_missing_variable(self):
+        """测试缺失变量时抛出ValueError"""
+        prompt = PromptTemplate(name="t", version="1", description="", template="{a}{b}", variables=["a", "b"])
+        with pytest.raises(ValueError, match="Template variable missing: b"):
+            prompt.render(a="x")
+
+    def test_variables_follow_template(self):
+        """测试声明变量与模板不一致时以模板为准"""
+        prompt = PromptTemplate(name="t", version="1", description="", template="{b}{a}{d[k]}",
+                                variables=["a", "c"])
+        assert prompt.variables == ["b", "a", "d"]
+        with pytest.raises(ValueError, match="Template variable missing: b"):
+            prompt.render(a="x", d={})
+
+    def test_compiled_state_not_serialized(self):
+        """测试编译状态不出现在dataclass字段中"""
+        from dataclasses import asdict
+        prompt = PromptTemplate(name="t", version="1", description="", template="{a}", variables=["a"])
+        assert set(asdict(prompt)) == {"name", "version", "description", "template", "variables",
+                                       "category", "created_at", "updated_at"}
+
+    def test_render_after_template_change(self):
+        """测试模板修改后重新编译"""
+        prompt = PromptTemplate(name="t", version="1", description="", template="{a}", variables=["a"])
+        assert prompt.render(a=1) == "1"
+        prompt.template = "<{a}>"
+        assert prompt.render(a=1) == "<1>"
+
+
+class TestPromptManager:
+    """PromptManager测试"""
+
+    def test_render_cache_hit(self, manager):
+        """测试相同参数命中渲染缓存"""
+        first = manager.render_prompt("web_only", web_context="W", query="Q")
+        second = manager.render_prompt("web_only", query="Q", web_context="W")
+        assert first is second
+        assert len(manager._render_cache) == 1
+
+    def test_render_cache_invalidated_on_update(self, manager):
+        """测试自定义提示词变更后缓存失效"""
+        manager.add_custom_prompt(PromptTemplate(name="c", version="1", description="", template="A{q}",
+                                                 variables=["q"]))
+        assert manager.render_prompt("c", q="1") == "A1"
+        manager.update_custom_prompt("c", template="B{q}")
+        assert manager.render_prompt("c", q="1") == "B1"
+
+    def test_render_cache_keeps_equal_values_of_different_types_apart(self, manager):
+        """测试相等但类型不同的参数不共用缓存"""
+        manager.add_custom_prompt(PromptTemplate(name="c", version="1", description="", template="{q}",
+                                                 variables=["q"]))
+        assert manager.render_prompt("c", q=1) == "1"
+        assert manager.render_prompt("c", q=True) == "True"
+        assert manager.render_prompt("c", q=1.0) == "1.0"
+
+    def test_render_cache_skips_large_values(self, manager):
+        """测试超大参数不进入缓存"""
+        manager.render_prompt("language_detection", text="x" * (64 * 1024 + 1))
+        assert not manager._render_cache
+
+    def test_builtins_materialized_lazily(self, manager):
+        """测试内置提示词按需实例化"""
+        assert not manager.built_in_prompts
+        assert manager.get_prompt("web_only").name == "web_only"
+        assert list(manager.built_in_prompts) == ["web_only"]
+        assert sum(len(v) for v in manager.list_prompts().values()) == len(_BUILTIN_SPECS)
+
+    def test_detect_language(self, manager):
+        """测试单次扫描的语言检测"""
+        assert manager.detect_language("什么是机器学习？") == "zh"
+        assert manager.detect_language("What is machine learning?") == "en"
+        assert manager.detect_language("これはテストです") == "ja"
+        assert manager.detect_language("안녕하세요 세계") == "ko"
+        assert manager.detect_language("  ") == "unknown"
+        assert manager.detect_language("?!") == "unknown"
+
+    def test_custom_prompts_parse_cached(self, tmp_path):
+        """测试未修改的自定义提示词文件复用解析结果"""
+        data = {"prompts": [{"name": "c", "version": "1", "description": "", "template": "{q}",
+                             "variables": ["q"]}]}
+        (tmp_path / "custom_prompts.yaml").write_text(yaml.safe_dump(data), encoding="utf-8")
+        first = PromptManager(prompts_dir=str(tmp_path))
+        first.custom_prompts["c"].variables.append("x")
+        cached = _YAML_CACHE[str((tmp_path / "custom_prompts.yaml").resolve())][2]
+        second = PromptManager(prompts_dir=str(tmp_path))
+        assert _YAML_CACHE[str((tmp_path / "custom_prompts.yaml").resolve())][2] is cached
+        assert second.custom_prompts["c"].variables == ["q"]
+
+    def test_list_prompts_view_refreshed_on_mutation(self, manager):
+        """测试分类视图在自定义提示词变更后刷新"""
+        assert manager.list_prompts("custom") == {"prompts": []}
+        prompt = PromptTemplate(name="c", version="1", description="", template="{q}", variables=["q"],
+                                category="custom")
+        manager.add_custom_prompt(prompt)
+        assert manager.list_prompts("custom") == {"prompts": [prompt]}
+        manager.update_custom_prompt("c", category="other")
+        assert manager.list_prompts()["other"] == [prompt]
+        manager.delete_custom_prompt("c")
+        assert "other" not in manager.list_prompts()
+
+    def test_custom_prompts_round_trip(self, tmp_path):
+        """测试自定义提示词保存后可重新加载"""
+        manager = PromptManager(prompts_dir=str(tmp_path))
+        assert manager.add_custom_prompt(PromptTemplate(name="c", version="1", description="中文",
+                                                        template="问：{q}", variables=["q"]))
+        assert not (tmp_path / "custom_prompts.yaml.tmp").exists()
+        reloaded = PromptManager(prompts_dir=str(tmp_path))
+        assert reloaded.render_prompt("c", q="x") == "问：x"
+        assert reloaded.custom_prompts["c"].description == "中文"
+
+    def test_select_adaptive_prompt(self, manager):
+        """测试自适应模板选择不依赖查询语言"""
+        for query in ("What is RAG?", "什么是RAG？", ""):
+            assert manager.select_adaptive_prompt(query) == "rag_qa_adaptive"
+        assert manager.select_adaptive_prompt("q", base_template="web_only") == "rag_qa_adaptive"
+
+    def test_global_manager_created_lazily(self, monkeypatch):
+        """测试全局管理器在首次获取时创建"""
+        from src.prompts import prompt_manager as module
+        monkeypatch.setattr(module, "_prompt_manager", None)
+        manager = module.get_prompt_manager()
+        assert module.get_prompt_manager() is manager
+
+    def test_timestamps_preserved(self):
+        """测试已有时间戳不被覆盖"""
+        prompt = PromptTemplate(name="t", version="1", description="", template="", variables=[],
+                                created_at="2024-01-01T00:00:00", updated_at="2024-01-02T00:00:00")
+        assert prompt.updated_at == "2024-01-02T00:00:00"
+        fresh = PromptTemplate(name="t", version="1", description="", template="", variables=[])
+        assert fresh.updated_at == fresh.created_at
+
+    def test_update_ignores_unknown_fields(self, manager):
+        """测试更新时忽略非字段属性"""
+        manager.add_custom_prompt(PromptTemplate(name="c", version="1", description="", template="{q}",
+                                                 variables=["q"]))
+        manager.update_custom_prompt("c", render=None, bogus=1, version="2")
+        prompt = manager.get_prompt("c")
+        assert prompt.version == "2"
+        assert not hasattr(prompt, "bogus")
+        assert prompt.render(q="x") == "x"
+
+    def test_compact_keeps_other_writers_entries(self, tmp_path):
+        """测试压缩时保留其他进程写入的日志条目"""
+        manager = PromptManager(prompts_dir=str(tmp_path))
+        other = PromptManager(prompts_dir=str(tmp_path))
+        manager.add_custom_prompt(PromptTemplate(name="a", version="1", description="", template="{q}",
+                                                 variables=["q"]))
+        other.add_custom_prompt(PromptTemplate(name="b", version="1", description="", template="{q}",
+                                               variables=["q"]))
+        assert manager.compact()
+        assert set(manager.custom_prompts) == {"a", "b"}
+        assert set(PromptManager(prompts_dir=str(tmp_path)).custom_prompts) == {"a", "b"}
+
+    def test_journal_replayed_and_compacted(self, tmp_path):
+        """测试编辑日志的回放与压缩"""
+        manager = PromptManager(prompts_dir=str(tmp_path))
+        manager.add_custom_prompt(PromptTemplate(name="a", version="1", description="", template="{q}",
+                                                 variables=["q"]))
+        manager.add_custom_prompt(PromptTemplate(name="b", version="1", description="", template="{q}",
+                                                 variables=["q"]))
+        assert not (tmp_path / "custom_prompts.yaml").exists()
+        assert list(PromptManager(prompts_dir=str(tmp_path)).custom_prompts) == ["a", "b"]
+
+        manager.delete_custom_prompt("a")
+        assert PromptManager(prompts_dir=str(tmp_path)).custom_prompts.keys() == {"b"}
+        assert manager.compact()
+        assert (tmp_path / "custom_prompts.jsonl").read_text(encoding="utf-8") == ""
+        assert list(PromptManager(prompts_dir=str(tmp_path)).custom_prompts) == ["b"]
+
+        for version in "234":
+            manager.update_custom_prompt("b", version=version)
+        assert (tmp_path / "custom_prompts.jsonl").read_text(encoding="utf-8") == ""
+        assert PromptManager(prompts_dir=str(tmp_path)).custom_prompts["b"].version == "4"
+
+    def test_builtins_shared_across_managers(self, manager, tmp_path):
+        """测试内置提示词在管理器之间共享"""
+        other = PromptManager(prompts_dir=str(tmp_path / "other"))
+        assert manager.get_prompt("rag_qa") is other.get_prompt("rag_qa")
+        assert manager.get_prompt("rag_qa").template is _BUILTIN_SPECS["rag_qa"]["template"]
+
+    def test_render_many(self, manager):
+        """测试批量渲染"""
+        batch = [{"text": "a"}, {"text": "b"}]
+        assert manager.render_many("language_detection", batch) == [
+            manager.render_prompt("language_detection", **kwargs) for kwargs in batch]
+        with pytest.raises(ValueError, match="not found"):
+            manager.render_many("missing", batch)
+
+    def test_export_prompts(self, manager, tmp_path):
+        """测试导出JSON文件与返回内容一致"""
+        output = tmp_path / "export.json"
+        text = manager.export_prompts(str(output))
+        assert output.read_text(encoding="utf-8") == text
+        assert json.loads(text)["export_info"]["total_prompts"] == len(_BUILTIN_SPECS)
+        assert manager.export_prompts(str(tmp_path / "export.yaml"), return_str=False) is None
+        assert yaml.safe_load((tmp_path / "export.yaml").read_text(encoding="utf-8"))["prompts"]
+
+    def test_clear_render_cache(self, manager):
+        """测试手动清空渲染缓存"""
+        manager.render_prompt("language_detection", text="a")
+        manager.clear_render_cache()
+        assert not manager._render_cache
+
+    def test_detect_language_ascii_digits(self, manager):
+        """测试ASCII快速路径保持原有比例判断"""
+        assert manager.detect_language("123456 ab") == "zh"
+        assert manager.detect_language("abc_12") == "en"
+
+    def test_category_index_override_builtin(self, manager):
+        """测试自定义提示词覆盖内置提示词时分类索引正确"""
+        assert len(manager.list_prompts("analysis")["prompts"]) == 2
+        manager.add_custom_prompt(PromptTemplate(name="query_analysis", version="2", description="",
+                                                 template="{query}", variables=["query"], category="custom"))
+        assert [p.name for p in manager.list_prompts("analysis")["prompts"]] == ["language_detection"]
+        manager.delete_custom_prompt("query_analysis")
+        assert len(manager.list_prompts("analysis")["prompts"]) == 2
+        assert "custom" not in manager.list_prompts()
+
+    def test_detect_language_memoized(self, manager):
+        """测试短文本语言检测结果被缓存"""
+        from src.prompts.prompt_manager import _detect_language_cached
+        _detect_language_cached.cache_clear()
+        manager.detect_language("缓存测试")
+        manager.detect_language("缓存测试")
+        assert _detect_language_cached.cache_info().hits == 1
+        assert manager.detect_language("a" * 2000) == "en"
+        assert _detect_language_cached.cache_info().currsize == 1
+
+    def test_export_cached_until_mutation(self, manager):
+        """测试导出结果在变更前复用"""
+        first = manager.export_prompts()
+        assert manager.export_prompts() is first
+        manager.add_custom_prompt(PromptTemplate(name="c", version="1", description="", template="{q}",
+                                                 variables=["q"]))
+        second = manager.export_prompts()
+        assert second is not first
+        assert json.loads(second)["export_info"]["total_prompts"] == len(_BUILTIN_SPECS) + 1
@@ -7,7 +7,7 @@ from unittest.mock import Mock, AsyncMock, patch
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.documents import Document
 
-from src.rag.workflow import RAGState, RAGWorkflow
+from src.rag.workflow import RAGState, RAGWorkflow, _route_after_retrieval
 
 
 class TestRAGState:
@@ -156,10 +156,10 @@ class TestRAGWorkflow:
         assert result.web_results[0]["title"] == "示例搜索结果"
     
     @pytest.mark.asyncio
-    async def test_fuse_information(self, mock_workflow):
-        """测试信息融合"""
-        documents = [Document(page_content="Doc content", metadata={"source": "doc.txt"})]
-        web_results = [{"content": "Web content", "url": "http://example.com", "title": "Example"}]
+    async def test_fuse_and_build_context(self, mock_workflow):
+        """测试信息融合与上下文构建"""
+        documents = [Document(page_content="Content 1", metadata={"filename": "doc.txt"})]
+        web_results = [{"content": "Content 2", "url": "http://example.com", "title": "Example"}]
         
         state = RAGState(
             query="test",
@@ -167,35 +167,20 @@ class TestRAGWorkflow:
             web_results=web_results
         )
         
-        result = await mock_workflow.fuse_information(state)
+        result = await mock_workflow.fuse_and_build_context(state)
         
         assert result.metadata["total_sources"] == 2
-        assert len(result.metadata["fused_sources"]) == 2
-        
-        sources = result.metadata["fused_sources"]
-        assert sources[0]["source"] == "knowledge_base"
-        assert sources[1]["source"] == "web_search"
-    
-    @pytest.mark.asyncio
-    async def test_build_context(self, mock_workflow):
-        """测试上下文构建"""
-        fused_sources = [
-            {"content": "Content 1", "source": "knowledge_base"},
-            {"content": "Content 2", "source": "web_search"}
-        ]
-        
-        state = RAGState(
-            query="test",
-            metadata={"fused_sources": fused_sources}
-        )
-        
-        result = await mock_workflow.build_context(state)
-        
-        assert result.context != ""
         assert "Content 1" in result.context
         assert "Content 2" in result.context
-        assert "来源1" in result.context
-        assert "来源2" in result.context
+        assert "Document: doc.txt" in result.knowledge_context
+        assert "Link: http://example.com" in result.web_context
+        assert "knowledge_context" not in result.metadata
+    
+    def test_route_after_retrieval(self):
+        """测试无检索结果时跳过信息融合"""
+        assert _route_after_retrieval(RAGState(query="test", metadata={"total_results": 2})) == "fusion"
+        assert _route_after_retrieval(RAGState(query="test", metadata={"total_results": 0})) == "fallback"
+        assert _route_after_retrieval(RAGState(query="test")) == "fallback"
     
     @pytest.mark.asyncio
     async def test_generate_response_success(self, mock_workflow):
@@ -272,10 +257,7 @@ class TestRAGWorkflowIntegration:
         routed_state = await mock_workflow.route_retrieval(analyzed_state)
         assert "retrieval_strategy" in routed_state.metadata
         
-        # 测试信息融合
-        fused_state = await mock_workflow.fuse_information(routed_state)
-        assert "total_sources" in fused_state.metadata
-        
-        # 测试上下文构建
-        context_state = await mock_workflow.build_context(fused_state)
+        # 测试信息融合与上下文构建
+        context_state = await mock_workflow.fuse_and_build_context(routed_state)
+        assert "total_sources" in context_state.metadata
         assert context_state.context is not None
\ No newline at end of file
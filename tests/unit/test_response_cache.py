@@ -0,0 +1,63 @@
+"""
+响应缓存单元测试
+"""
+
+import pytest
+
+from src.rag import response_cache
+from src.rag.response_cache import ResponseCache
+
+
+class TestResponseCache:
+    """ResponseCache测试"""
+
+    def test_exact_hit_and_collection_scope(self):
+        """测试精确命中且按知识库区分"""
+        cache = ResponseCache()
+        cache.put(ResponseCache.key("q", "kb1"), "state", "kb1")
+        assert cache.get(ResponseCache.key("q", "kb1")) == "state"
+        assert cache.get(ResponseCache.key("q", "kb2")) is None
+
+    def test_key_normalization(self):
+        """测试查询规范化后命中同一键"""
+        assert ResponseCache.key("  What is  RAG？", "kb") == ResponseCache.key("what is rag?", "kb")
+        assert ResponseCache.key("what is rag", "kb") != ResponseCache.key("what is rag?", "kb")
+
+    def test_invalidate_collection(self):
+        """测试知识库写入后清除该库及默认库的缓存"""
+        cache = ResponseCache()
+        cache.put(b"a", 1, "kb1")
+        cache.put(b"b", 2, "kb2")
+        cache.put(b"c", 3)
+        response_cache.invalidate_collection("kb1")
+        assert cache.get(b"a") is None and cache.get(b"c") is None
+        assert cache.get(b"b") == 2
+
+    def test_lru_eviction(self):
+        """测试超过容量时淘汰最久未使用的条目"""
+        cache = ResponseCache(max_entries=2)
+        cache.put(b"a", 1)
+        cache.put(b"b", 2)
+        cache.get(b"a")
+        cache.put(b"c", 3)
+        assert cache.get(b"b") is None
+        assert cache.get(b"a") == 1 and cache.get(b"c") == 3
+
+    def test_ttl_expiry(self, monkeypatch):
+        """测试过期条目不再命中"""
+        cache = ResponseCache(ttl=10)
+        now = [100.0]
+        monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+        cache.put(b"a", 1)
+        now[0] += 11
+        assert cache.get(b"a") is None
+        assert len(cache) == 0
+
+    def test_semantic_hit_above_threshold(self):
+        """测试相似查询向量命中缓存"""
+        pytest.importorskip("numpy")
+        cache = ResponseCache(similarity_threshold=0.95)
+        cache.put(b"a", "state", "kb", [1.0, 0.0, 0.0])
+        assert cache.nearest([0.99, 0.05, 0.0], "kb") == "state"
+        assert cache.nearest([0.99, 0.05, 0.0], "other") is None
+        assert cache.nearest([0.0, 1.0, 0.0], "kb") is None
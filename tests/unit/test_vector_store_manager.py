@@ -0,0 +1,181 @@
+"""
+向量存储管理器单元测试
+"""
+
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from langchain_core.documents import Document
+
+from src.knowledge_base import vector_store_manager
+from src.knowledge_base.vector_store_manager import VectorStoreManager
+
+
+class FakeEmbeddings:
+    """按文本长度生成固定向量的嵌入模型"""
+
+    model = "fake-embedding"
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0, 0.0]
+
+
+class FakeCollection:
+    """支持content_hash查询的Milvus集合替身"""
+
+    name = "fake"
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @property
+    def num_entities(self):
+        return len(self.rows)
+
+    def query(self, expr, output_fields):
+        hashes = set(json.loads(expr[len("content_hash in "):]))
+        return [
+            {"content_hash": row.metadata.get("content_hash")}
+            for row in self.rows if row.metadata.get("content_hash") in hashes
+        ]
+
+
+class FakeVectorStore:
+    """记录写入行的向量存储替身"""
+
+    def __init__(self, fail_add_embeddings=False):
+        self.rows = []
+        self.col = FakeCollection(self.rows)
+        self.embeddings = FakeEmbeddings()
+        self.fail_add_embeddings = fail_add_embeddings
+
+    def add_embeddings(self, texts, embeddings, metadatas):
+        if self.fail_add_embeddings:
+            raise RuntimeError("insert rejected")
+        self.rows.extend(
+            Document(page_content=text, metadata=dict(metadata))
+            for text, metadata in zip(texts, metadatas)
+        )
+
+    async def aadd_documents(self, documents):
+        self.rows.extend(
+            Document(page_content=doc.page_content, metadata=dict(doc.metadata)) for doc in documents
+        )
+
+    def similarity_search_by_vector(self, vector, k, param=None, expr=None):
+        return self.rows[:k]
+
+
+@pytest.fixture
+def make_manager(tmp_path):
+    """用替身存储构造管理器，每个测试使用独立的本地镜像"""
+    settings = SimpleNamespace(
+        kb_max_inflight_batches=2,
+        embedding_batch_size=8,
+        kb_quantize="none",
+        kb_local_mirror=False,
+        knowledge_base_path=str(tmp_path),
+    )
+
+    def factory(store, local_mirror=False, batch_size=8):
+        settings.kb_local_mirror = local_mirror
+        with patch.object(vector_store_manager, "get_settings", return_value=settings), \
+                patch.object(vector_store_manager.model_config, "get_vector_store", return_value=store):
+            return VectorStoreManager(batch_size=batch_size, collection_name="test_collection")
+
+    vector_store_manager._local_mirrors.clear()
+    yield factory
+    vector_store_manager._local_mirrors.clear()
+
+
+def _chunks(count, source="a.txt"):
+    return [Document(page_content=f"chunk {i}", metadata={"source": source}) for i in range(count)]
+
+
+class TestVectorStoreManagerIngestion:
+    """向量写入与去重测试"""
+
+    @pytest.mark.asyncio
+    async def test_mirror_failure_does_not_reinsert(self, make_manager):
+        """测试后端写入成功但镜像更新失败时不重复写入"""
+        store = FakeVectorStore()
+        manager = make_manager(store)
+        manager._mirror.enabled = True
+
+        with patch.object(manager, "_mirror_add", side_effect=RuntimeError("mirror broken")):
+            result = await manager.add_documents(_chunks(3))
+
+        assert result["added_count"] == 3
+        assert len(store.rows) == 3
+        assert manager._mirror.enabled is False
+
+    @pytest.mark.asyncio
+    async def test_fallback_disables_mirror_then_search_and_dedupe(self, make_manager):
+        """测试回退写入后镜像失效，检索与去重都以后端为准"""
+        store = FakeVectorStore(fail_add_embeddings=True)
+        manager = make_manager(store)
+        manager._mirror.enabled = True
+
+        result = await manager.add_documents(_chunks(3))
+        assert result["added_count"] == 3
+        assert manager._mirror.enabled is False
+        assert not manager._local_index_ready()
+
+        docs = await manager.search_similar("chunk 1", k=5)
+        assert len(docs) == 3
+
+        again = await manager.add_documents(_chunks(3))
+        assert again["skipped_count"] == 3
+        assert len(store.rows) == 3
+
+    @pytest.mark.asyncio
+    async def test_same_chunk_from_two_sources(self, make_manager):
+        """测试不同来源的相同内容分别保留且不修改调用方元数据"""
+        store = FakeVectorStore()
+        manager = make_manager(store)
+        documents = _chunks(1, "a.txt") + _chunks(1, "b.txt") + _chunks(1, "a.txt")
+
+        result = await manager.add_documents(documents)
+
+        assert result["added_count"] == 2
+        assert result["skipped_count"] == 1
+        assert sorted(row.metadata["source"] for row in store.rows) == ["a.txt", "b.txt"]
+        assert all("content_hash" not in doc.metadata for doc in documents)
+
+    @pytest.mark.asyncio
+    async def test_mirror_not_served_after_external_write(self, make_manager):
+        """测试其他进程写入后不再使用本地镜像检索"""
+        pytest.importorskip("faiss")
+        store = FakeVectorStore()
+        manager = make_manager(store, local_mirror=True)
+        await manager.add_documents(_chunks(3))
+        assert manager._local_index_ready() and manager._local_index_fresh()
+
+        store.rows.append(Document(page_content="external", metadata={"source": "c.txt"}))
+
+        assert not manager._local_index_fresh()
+        docs = await manager.search_similar("chunk 1", k=5)
+        assert len(docs) == 4
+
+    def test_mirror_disabled_by_default(self, make_manager):
+        """测试默认不启用本地镜像"""
+        manager = make_manager(FakeVectorStore())
+        assert manager._mirror.enabled is False
+
+    @pytest.mark.asyncio
+    async def test_batch_size_tuned_once_per_call(self, make_manager):
+        """测试每次入库最多调整一次批大小并持久化"""
+        with patch.object(vector_store_manager, "DEFAULT_BATCH_SIZE", 4), \
+                patch.object(vector_store_manager, "_load_tuned_batch_size", return_value=None), \
+                patch.object(vector_store_manager, "_save_tuned_batch_size") as save:
+            manager = make_manager(FakeVectorStore(), batch_size=None)
+            result = await manager.add_documents(_chunks(40))
+
+        assert result["added_count"] == 40
+        assert manager.batch_size == 8
+        save.assert_called_once_with(manager._tuning_key, 8)